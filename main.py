@@ -14,18 +14,28 @@ from discord.ext import commands
 from discord.commands import Option
 from discord import ui
 import os
+import io
 import json
 import asyncio
 from discord.interactions import Interaction
 from dotenv import load_dotenv
 import sqlite3
-from datetime import datetime, timedelta
+import concurrent.futures
+import functools
+from datetime import datetime
 import re
 import string
 import requests
 import logging
 import colorlog
 import sys
+import time
+import math
+import heapq
+import collections
+import bisect
+import itertools
+import random
 
 #* Load .env
 load_dotenv()
@@ -59,41 +69,854 @@ def log_exception(exc_type, exc_value, exc_traceback):
 sys.excepthook = log_exception
 
 #* Server Data Database (.db)
-conn = sqlite3.connect('server_data.db')
-c = conn.cursor()
-
-#* Create Tables
-# Roles the bot prevents users from having
-c.execute('''CREATE TABLE IF NOT EXISTS roles
-                (server_id int, role_id int)''')
-# Roles the bot will ignore when preventing roles
-c.execute('''CREATE TABLE IF NOT EXISTS bypass
-                (server_id int, role_id int)''')
-# Roles the bot will give to users when they join
-c.execute('''CREATE TABLE IF NOT EXISTS auto
-                (server_id int, role_id int)''')
-# The bot's role for the server
-c.execute('''CREATE TABLE IF NOT EXISTS bot_role
-                (server_id int, role_id int)''')
-# The bot's channel for announcements
-c.execute('''CREATE TABLE IF NOT EXISTS announcements
-                (server_id int, channel_id int)''')
-# Roles that can manage the bot
-c.execute('''CREATE TABLE IF NOT EXISTS manager_roles
-                (server_id int, role_id int)''')
-# Temp roles
-c.execute('''CREATE TABLE IF NOT EXISTS temp_roles
-                (server_id int, role_id int, user_id int, time int)''')
-# Self roles Server ID, Channel ID, Message ID, Menu Type, and Role ID with emoji for that role
-c.execute('''CREATE TABLE IF NOT EXISTS self_roles
-                (server_id int, channel_id int, message_id int, menu_type text, role_id int, emoji text)''')
-# self_role_templates
-c.execute('''CREATE TABLE IF NOT EXISTS self_role_templates
-                (server_id int, channel_id int, message_id int, menu_type text, role_id int, emoji text)''')
-conn.commit()
+# Roles the bot prevents users from having, ignores, gives on join, or lets manage the bot
+ROLE_TABLES = {
+    'protected': 'roles',
+    'bypass': 'bypass',
+    'auto': 'auto',
+    'manager': 'manager_roles',
+}
+
+# Imported into the blacklist table by migration_blacklist, no longer read after that
+BLACKLIST_FILE = 'blacklist.json'
+
+# Every table holding per-server data
+SERVER_TABLES = ('roles', 'bypass', 'auto', 'bot_role', 'announcements', 'manager_roles', 'temp_roles', 'self_roles', 'self_role_templates', 'setup_reminders')
+
+#* Schema migrations
+# Each step runs once, in order, inside its own transaction. Never change a released step, add a new one.
+def migration_create_tables(cursor):
+    # Roles the bot prevents users from having
+    cursor.execute('''CREATE TABLE IF NOT EXISTS roles
+                    (server_id int, role_id int)''')
+    # Roles the bot will ignore when preventing roles
+    cursor.execute('''CREATE TABLE IF NOT EXISTS bypass
+                    (server_id int, role_id int)''')
+    # Roles the bot will give to users when they join
+    cursor.execute('''CREATE TABLE IF NOT EXISTS auto
+                    (server_id int, role_id int)''')
+    # The bot's role for the server
+    cursor.execute('''CREATE TABLE IF NOT EXISTS bot_role
+                    (server_id int, role_id int)''')
+    # The bot's channel for announcements
+    cursor.execute('''CREATE TABLE IF NOT EXISTS announcements
+                    (server_id int, channel_id int)''')
+    # Roles that can manage the bot
+    cursor.execute('''CREATE TABLE IF NOT EXISTS manager_roles
+                    (server_id int, role_id int)''')
+    # Temp roles
+    cursor.execute('''CREATE TABLE IF NOT EXISTS temp_roles
+                    (server_id int, role_id int, user_id int, time int)''')
+    # Self roles Server ID, Channel ID, Message ID, Menu Type, and Role ID with emoji for that role
+    cursor.execute('''CREATE TABLE IF NOT EXISTS self_roles
+                    (server_id int, channel_id int, message_id int, menu_type text, role_id int, emoji text)''')
+    # self_role_templates
+    cursor.execute('''CREATE TABLE IF NOT EXISTS self_role_templates
+                    (server_id int, channel_id int, message_id int, menu_type text, role_id int, emoji text)''')
+
+def rebuild_table(cursor, table, columns, key):
+    # Copies a table into a keyed version of itself. Rows are copied oldest first, so the newest duplicate wins.
+    column_names = ', '.join(name for name, _ in columns)
+    column_defs = ', '.join(f'{name} {definition}' for name, definition in columns)
+    key_filter = ' AND '.join(f'{name} IS NOT NULL' for name in key.split(', '))
+    cursor.execute(f'CREATE TABLE {table}_new ({column_defs}, PRIMARY KEY ({key}))')
+    cursor.execute(f'INSERT OR REPLACE INTO {table}_new ({column_names}) SELECT {column_names} FROM {table} WHERE {key_filter} ORDER BY rowid')
+    cursor.execute(f'DROP TABLE {table}')
+    cursor.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+
+def migration_keys_and_indexes(cursor):
+    # One row per role per server
+    for table in ROLE_TABLES.values():
+        rebuild_table(cursor, table, [('server_id', 'int NOT NULL'), ('role_id', 'int NOT NULL')], 'server_id, role_id')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {table}_role_id ON {table} (role_id)')
+    # One bot role and one announcement channel per server
+    rebuild_table(cursor, 'bot_role', [('server_id', 'int NOT NULL'), ('role_id', 'int')], 'server_id')
+    rebuild_table(cursor, 'announcements', [('server_id', 'int NOT NULL'), ('channel_id', 'int')], 'server_id')
+    # One temp role entry per role per member
+    rebuild_table(cursor, 'temp_roles', [('server_id', 'int NOT NULL'), ('role_id', 'int NOT NULL'), ('user_id', 'int NOT NULL'), ('time', 'int')], 'server_id, role_id, user_id')
+    cursor.execute('CREATE INDEX IF NOT EXISTS self_roles_server_id ON self_roles (server_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS self_roles_role_id ON self_roles (role_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS self_role_templates_server_id ON self_role_templates (server_id)')
+
+def migration_temp_role_epochs(cursor):
+    # temp_roles.time held naive local datetimes as text, store UTC epoch seconds so expiry can be range-queried
+    for rowid, value in cursor.execute('SELECT rowid, time FROM temp_roles').fetchall():
+        if isinstance(value, str):
+            try:
+                expiry = int(datetime.fromisoformat(value).timestamp())
+            except ValueError:
+                expiry = 0 # unreadable, expire it on the next pass
+            cursor.execute('UPDATE temp_roles SET time=? WHERE rowid=?', (expiry, rowid))
+    cursor.execute('CREATE INDEX IF NOT EXISTS temp_roles_time ON temp_roles (time)')
+
+def migration_blacklist(cursor):
+    # Blacklisted servers, previously kept in blacklist.json
+    cursor.execute('''CREATE TABLE IF NOT EXISTS blacklist
+                    (server_id int PRIMARY KEY, name text, reason text, time int)''')
+    try:
+        with open(BLACKLIST_FILE, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return
+    names = data.get('names', {})
+    reasons = data.get('reasons', {})
+    now = int(time.time())
+    for guild_id in data.get('servers', []):
+        cursor.execute('INSERT OR IGNORE INTO blacklist VALUES (?, ?, ?, ?)', (int(guild_id), names.get(guild_id, 'Unknown Server'), reasons.get(guild_id, 'No reason given.'), now))
+
+def migration_setup_reminders(cursor):
+    # When each unconfigured server is next reminded to run /setup, UTC epoch seconds
+    cursor.execute('''CREATE TABLE IF NOT EXISTS setup_reminders
+                    (server_id int PRIMARY KEY, next_reminder_at int NOT NULL)''')
+
+def migration_broadcasts(cursor):
+    # Announcement broadcasts and where each one has been delivered, so a restart can resume them
+    cursor.execute('''CREATE TABLE IF NOT EXISTS broadcasts
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, embed text NOT NULL, channel_id int, message_id int, created int, finished int)''')
+    # status is pending, delivered, fallback (sent to another channel) or failed
+    cursor.execute('''CREATE TABLE IF NOT EXISTS broadcast_deliveries
+                    (broadcast_id int NOT NULL, server_id int NOT NULL, status text NOT NULL DEFAULT 'pending', PRIMARY KEY (broadcast_id, server_id))''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS broadcast_deliveries_status ON broadcast_deliveries (broadcast_id, status)')
+
+MIGRATIONS = [
+    migration_create_tables,
+    migration_keys_and_indexes,
+    migration_temp_role_epochs,
+    migration_blacklist,
+    migration_setup_reminders,
+    migration_broadcasts,
+]
+
+class GuildConfig:
+    '''In-memory copy of a server's setup: role ID sets, the announcement channel and the bot's role.'''
+
+    __slots__ = ('protected', 'bypass', 'auto', 'manager', 'channel', 'bot_role')
+
+    def __init__(self, protected=(), bypass=(), auto=(), manager=(), channel=None, bot_role=None):
+        self.protected = set(protected)
+        self.bypass = set(bypass)
+        self.auto = set(auto)
+        self.manager = set(manager)
+        self.channel = channel
+        self.bot_role = bot_role
+
+    def roles(self, kind):
+        return getattr(self, kind)
+
+class Database:
+    '''Async access to the server data database.
+
+    All SQLite work runs on a single worker thread so queries and commits never block the event loop,
+    and every operation uses its own cursor.
+    '''
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.configs = {}
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='database')
+        self.migrate()
+        # Blacklisted server IDs, checked on every join so kept in memory
+        self.blacklist = {row[0] for row in self._fetchall('SELECT server_id FROM blacklist')}
+
+    def migrate(self):
+        # Brings the database up to the latest schema, one version at a time
+        cursor = self.conn.cursor()
+        cursor.execute('CREATE TABLE IF NOT EXISTS schema_version (version int NOT NULL)')
+        row = cursor.execute('SELECT version FROM schema_version').fetchone()
+        version = row[0] if row else 0
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            cursor.execute('BEGIN')
+            try:
+                migration(cursor)
+                cursor.execute('DELETE FROM schema_version')
+                cursor.execute('INSERT INTO schema_version VALUES (?)', (number,))
+            except:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+            logger.info(f'Database migrated to schema version {number}')
+        cursor.close()
+
+    async def run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    #* Worker thread helpers
+    def _fetchall(self, query, params=()):
+        cursor = self.conn.cursor()
+        try:
+            return cursor.execute(query, params).fetchall()
+        finally:
+            cursor.close()
+
+    def _fetchone(self, query, params=()):
+        cursor = self.conn.cursor()
+        try:
+            return cursor.execute(query, params).fetchone()
+        finally:
+            cursor.close()
+
+    def _execute(self, *statements):
+        # Runs (query, params) pairs in one transaction
+        cursor = self.conn.cursor()
+        try:
+            with self.conn:
+                for query, params in statements:
+                    cursor.execute(query, params)
+        finally:
+            cursor.close()
+
+    async def fetchall(self, query, params=()):
+        return await self.run(self._fetchall, query, params)
+
+    async def fetchone(self, query, params=()):
+        return await self.run(self._fetchone, query, params)
+
+    async def execute(self, *statements):
+        await self.run(self._execute, *statements)
+
+    def _executemany(self, query, rows):
+        cursor = self.conn.cursor()
+        try:
+            with self.conn:
+                cursor.executemany(query, rows)
+        finally:
+            cursor.close()
+
+    async def executemany(self, query, rows):
+        await self.run(self._executemany, query, rows)
+
+    #* Role lists (protected, bypass, auto, manager)
+    def _get_setup(self, guild_id):
+        setup = {}
+        for kind, table in ROLE_TABLES.items():
+            setup[kind] = [row[0] for row in self._fetchall(f'SELECT role_id FROM {table} WHERE server_id=?', (guild_id,))]
+        channel = self._fetchone('SELECT channel_id FROM announcements WHERE server_id=?', (guild_id,))
+        setup['channel'] = channel[0] if channel else None
+        bot_role = self._fetchone('SELECT role_id FROM bot_role WHERE server_id=?', (guild_id,))
+        setup['bot_role'] = bot_role[0] if bot_role else None
+        return setup
+
+    async def get_config(self, guild_id):
+        # Cached setup for the server, loaded from the database the first time it is needed
+        config = self.configs.get(guild_id)
+        if config is None:
+            # The worker thread runs jobs in order, so a write queued after this load always patches its result
+            setup = await self.run(self._get_setup, guild_id)
+            config = self.configs.setdefault(guild_id, GuildConfig(**setup))
+        return config
+
+    def _get_all_setups(self):
+        setups = {}
+        for kind, table in ROLE_TABLES.items():
+            for guild_id, role_id in self._fetchall(f'SELECT server_id, role_id FROM {table}'):
+                setups.setdefault(guild_id, {}).setdefault(kind, []).append(role_id)
+        for guild_id, channel_id in self._fetchall('SELECT server_id, channel_id FROM announcements'):
+            setups.setdefault(guild_id, {})['channel'] = channel_id
+        for guild_id, role_id in self._fetchall('SELECT server_id, role_id FROM bot_role'):
+            setups.setdefault(guild_id, {})['bot_role'] = role_id
+        return setups
+
+    async def load_configs(self, guild_ids):
+        # Warms the cache for every server in one pass instead of one query per server
+        setups = await self.run(self._get_all_setups)
+        for guild_id in guild_ids:
+            self.configs.setdefault(guild_id, GuildConfig(**setups.get(guild_id, {})))
+
+    async def add_role(self, kind, guild_id, role_id):
+        await self.execute((f'INSERT OR IGNORE INTO {ROLE_TABLES[kind]} VALUES (?, ?)', (guild_id, role_id)))
+        if guild_id in self.configs:
+            self.configs[guild_id].roles(kind).add(role_id)
+
+    async def remove_role(self, kind, guild_id, role_id):
+        await self.remove_roles([kind], guild_id, role_id)
+
+    async def remove_roles(self, kinds, guild_id, role_id):
+        await self.execute(*[(f'DELETE FROM {ROLE_TABLES[kind]} WHERE server_id=? AND role_id=?', (guild_id, role_id)) for kind in kinds])
+        if guild_id in self.configs:
+            for kind in kinds:
+                self.configs[guild_id].roles(kind).discard(role_id)
+
+    async def remove_null_roles(self):
+        await self.execute(*[(f'DELETE FROM {table} WHERE role_id=0', ()) for table in ROLE_TABLES.values()])
+        for config in self.configs.values():
+            for kind in ROLE_TABLES:
+                config.roles(kind).discard(0)
+
+    #* Announcement channel
+    async def get_announcement_channel(self, guild_id):
+        return (await self.get_config(guild_id)).channel
+
+    async def set_announcement_channel(self, guild_id, channel_id):
+        await self.execute(('INSERT INTO announcements VALUES (?, ?) ON CONFLICT (server_id) DO UPDATE SET channel_id=excluded.channel_id', (guild_id, channel_id)))
+        if guild_id in self.configs:
+            self.configs[guild_id].channel = channel_id
+
+    async def remove_announcement_channel(self, guild_id):
+        await self.execute(('DELETE FROM announcements WHERE server_id=?', (guild_id,)))
+        if guild_id in self.configs:
+            self.configs[guild_id].channel = None
+
+    #* Server setup
+    async def setup_guild(self, guild_id, channel_id, protect=None, bypass=None, auto=None, manager=None):
+        statements = []
+        for kind, role_id in (('protected', protect), ('bypass', bypass), ('auto', auto), ('manager', manager)):
+            if role_id is not None:
+                statements.append((f'INSERT OR IGNORE INTO {ROLE_TABLES[kind]} VALUES (?, ?)', (guild_id, role_id)))
+        statements.append(('INSERT INTO announcements VALUES (?, ?) ON CONFLICT (server_id) DO UPDATE SET channel_id=excluded.channel_id', (guild_id, channel_id)))
+        await self.execute(*statements)
+        # Reload rather than patch, the server may already have roles from before a reset
+        self.configs.pop(guild_id, None)
+
+    async def reset_guild(self, guild_id):
+        # Clears the setup but keeps the bot role, temp roles and self roles
+        tables = list(ROLE_TABLES.values()) + ['announcements']
+        # load first, a server that is not cached yet still has its bot role in the database
+        config = await self.get_config(guild_id)
+        await self.execute(*[(f'DELETE FROM {table} WHERE server_id=?', (guild_id,)) for table in tables])
+        for kind in ROLE_TABLES:
+            config.roles(kind).clear()
+        config.channel = None
+
+    async def force_reset_guild(self, guild_id):
+        await self.execute(*[(f'DELETE FROM {table} WHERE server_id=?', (guild_id,)) for table in ('roles', 'bypass', 'auto')])
+        if guild_id in self.configs:
+            config = self.configs[guild_id]
+            config.protected.clear()
+            config.bypass.clear()
+            config.auto.clear()
+
+    async def purge_guild(self, guild_id):
+        await self.execute(*[(f'DELETE FROM {table} WHERE server_id=?', (guild_id,)) for table in SERVER_TABLES])
+        self.configs.pop(guild_id, None)
+
+    #* Bot role
+    async def get_bot_role(self, guild_id):
+        return (await self.get_config(guild_id)).bot_role
+
+    async def set_bot_role(self, guild_id, role_id):
+        await self.set_bot_roles({guild_id: role_id})
+
+    async def set_bot_roles(self, bot_roles):
+        # {server_id: role_id}, only servers whose role changed are written
+        changed = {}
+        for guild_id, role_id in bot_roles.items():
+            if (await self.get_config(guild_id)).bot_role != role_id:
+                changed[guild_id] = role_id
+        if not changed:
+            return
+        await self.executemany('INSERT INTO bot_role VALUES (?, ?) ON CONFLICT (server_id) DO UPDATE SET role_id=excluded.role_id', list(changed.items()))
+        for guild_id, role_id in changed.items():
+            self.configs[guild_id].bot_role = role_id
+
+    #* Temp roles
+    async def get_temp_roles(self, shard_id=0, shard_count=1):
+        # shard of a server is (server_id >> 22) % shard_count, same as discord's
+        return await self.fetchall('SELECT server_id, role_id, user_id, time FROM temp_roles WHERE (server_id >> 22) % ? = ?', (shard_count, shard_id))
+
+    async def get_due_temp_roles(self, now, shard_id=0, shard_count=1):
+        return await self.fetchall('SELECT server_id, role_id, user_id, time FROM temp_roles WHERE time <= ? AND (server_id >> 22) % ? = ?', (int(now), shard_count, shard_id))
+
+    async def add_temp_role(self, guild_id, role_id, user_id, expiry):
+        # expiry is in UTC epoch seconds
+        await self.execute(('INSERT INTO temp_roles VALUES (?, ?, ?, ?) ON CONFLICT (server_id, role_id, user_id) DO UPDATE SET time=excluded.time', (guild_id, role_id, user_id, int(expiry))))
+
+    async def remove_temp_role(self, guild_id, role_id, user_id):
+        await self.execute(('DELETE FROM temp_roles WHERE server_id=? AND role_id=? AND user_id=?', (guild_id, role_id, user_id)))
+
+    async def remove_temp_roles(self, keys):
+        # (server_id, role_id, user_id) keys, deleted in one transaction
+        await self.executemany('DELETE FROM temp_roles WHERE server_id=? AND role_id=? AND user_id=?', keys)
+
+    #* Setup reminders
+    async def get_configured_guilds(self):
+        # Servers that have run /setup, ie. have an announcement channel
+        return {row[0] for row in await self.fetchall('SELECT server_id FROM announcements WHERE channel_id IS NOT NULL')}
+
+    async def get_reminder_times(self):
+        return dict(await self.fetchall('SELECT server_id, next_reminder_at FROM setup_reminders'))
+
+    async def set_reminder_times(self, times):
+        await self.executemany('INSERT INTO setup_reminders VALUES (?, ?) ON CONFLICT (server_id) DO UPDATE SET next_reminder_at=excluded.next_reminder_at', list(times.items()))
+
+    async def remove_reminder_times(self, guild_ids):
+        await self.executemany('DELETE FROM setup_reminders WHERE server_id=?', [(guild_id,) for guild_id in guild_ids])
+
+    #* Broadcasts
+    async def get_announcement_channels(self):
+        # {server_id: channel_id} for every server, in one query
+        return dict(await self.fetchall('SELECT server_id, channel_id FROM announcements'))
+
+    def _create_broadcast(self, embed, guild_ids):
+        cursor = self.conn.cursor()
+        try:
+            with self.conn:
+                cursor.execute('INSERT INTO broadcasts (embed, created) VALUES (?, ?)', (embed, int(time.time())))
+                broadcast_id = cursor.lastrowid
+                cursor.executemany('INSERT OR IGNORE INTO broadcast_deliveries (broadcast_id, server_id) VALUES (?, ?)', [(broadcast_id, guild_id) for guild_id in guild_ids])
+            return broadcast_id
+        finally:
+            cursor.close()
+
+    async def create_broadcast(self, embed, guild_ids):
+        # embed is the announcement's embed as json, returns the new broadcast's id
+        return await self.run(self._create_broadcast, embed, guild_ids)
+
+    async def get_broadcast(self, broadcast_id):
+        return await self.fetchone('SELECT embed, channel_id, message_id FROM broadcasts WHERE id=?', (broadcast_id,))
+
+    async def get_unfinished_broadcasts(self):
+        return [row[0] for row in await self.fetchall('SELECT id FROM broadcasts WHERE finished IS NULL ORDER BY id')]
+
+    async def set_broadcast_message(self, broadcast_id, channel_id, message_id):
+        # the message progress is edited into
+        await self.execute(('UPDATE broadcasts SET channel_id=?, message_id=? WHERE id=?', (channel_id, message_id, broadcast_id)))
+
+    async def finish_broadcast(self, broadcast_id):
+        await self.execute(('UPDATE broadcasts SET finished=? WHERE id=?', (int(time.time()), broadcast_id)))
+
+    async def get_deliveries(self, broadcast_id, status):
+        return [row[0] for row in await self.fetchall('SELECT server_id FROM broadcast_deliveries WHERE broadcast_id=? AND status=?', (broadcast_id, status))]
+
+    async def get_delivery_counts(self, broadcast_id):
+        return dict(await self.fetchall('SELECT status, count(*) FROM broadcast_deliveries WHERE broadcast_id=? GROUP BY status', (broadcast_id,)))
+
+    async def set_delivery_statuses(self, broadcast_id, statuses):
+        # {server_id: status}, written in one transaction
+        await self.executemany('UPDATE broadcast_deliveries SET status=? WHERE broadcast_id=? AND server_id=?', [(status, broadcast_id, guild_id) for guild_id, status in statuses.items()])
+
+    #* Blacklist
+    def is_blacklisted(self, guild_id):
+        return guild_id in self.blacklist
+
+    async def add_blacklist(self, guild_id, name, reason):
+        await self.execute(('INSERT INTO blacklist VALUES (?, ?, ?, ?) ON CONFLICT (server_id) DO UPDATE SET name=excluded.name, reason=excluded.reason, time=excluded.time', (guild_id, name, reason, int(time.time()))))
+        self.blacklist.add(guild_id)
+
+    async def remove_blacklist(self, guild_id):
+        await self.execute(('DELETE FROM blacklist WHERE server_id=?', (guild_id,)))
+        self.blacklist.discard(guild_id)
+
+    async def get_blacklist_page(self, page, per_page):
+        # (server_id, name, reason, time) rows for one page, oldest first
+        return await self.fetchall('SELECT server_id, name, reason, time FROM blacklist ORDER BY time, server_id LIMIT ? OFFSET ?', (per_page, page * per_page))
+
+    #* Self roles
+    async def is_self_role(self, role_id):
+        return await self.fetchone('SELECT role_id FROM self_roles WHERE role_id=?', (role_id,)) is not None
+
+    #* Dev helpers
+    def _get_schema(self):
+        return {table: self._fetchall(f'PRAGMA table_info({table})') for table in SERVER_TABLES}
+
+    async def get_schema(self):
+        return await self.run(self._get_schema)
+
+    def _get_raw_data(self, guild_id):
+        return {table: self._fetchall(f'SELECT * FROM {table} WHERE server_id=?', (guild_id,)) for table in SERVER_TABLES}
+
+    async def get_raw_data(self, guild_id):
+        return await self.run(self._get_raw_data, guild_id)
+
+
+db = Database('server_data.db')
+
+#* Role giver attribution
+class RoleAttribution:
+    '''Short-lived record of who gave which role to whom, filled from audit log gateway events.
+
+    Entries are keyed per server by (target_id, role_id), so two role changes racing each other
+    are attributed to the right giver without asking the audit log REST endpoint. Each entry answers
+    one grant only: it goes straight to a waiting grant or is removed when read, so a later grant of
+    the same role waits for its own audit log event instead of blaming the earlier giver.
+    '''
+
+    def __init__(self, ttl=30, timeout=2):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.givers = {}
+        self.waiters = {}
+
+    def record(self, guild_id, target_id, role_id, giver):
+        now = time.monotonic()
+        givers = self.givers.setdefault(guild_id, {})
+        if len(givers) > 256:
+            for key in [key for key, (_, expires) in givers.items() if expires <= now]:
+                del givers[key]
+        # hand the giver to the oldest grant still waiting, only keep it if nobody is waiting yet
+        for future in self.waiters.get((guild_id, target_id, role_id), []):
+            if not future.done():
+                future.set_result(giver)
+                return
+        givers[(target_id, role_id)] = (giver, now + self.ttl)
+
+    async def wait_for(self, guild_id, target_id, role_id):
+        # The audit log event can arrive before or after the member update, wait briefly for it
+        giver, expires = self.givers.get(guild_id, {}).pop((target_id, role_id), (None, 0))
+        if expires > time.monotonic():
+            return giver
+        key = (guild_id, target_id, role_id)
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(key, []).append(future)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self.waiters.get(key)
+            if waiters is not None:
+                if future in waiters:
+                    waiters.remove(future)
+                if not waiters:
+                    del self.waiters[key]
+
+    def forget_guild(self, guild_id):
+        self.givers.pop(guild_id, None)
+
+
+role_givers = RoleAttribution()
+
+#* Outbound action queue
+# Priority classes, lower runs first
+ENFORCEMENT = 0 # removing protected roles
+ROLES = 1 # auto roles, temp roles and other role changes
+ANNOUNCEMENTS = 2 # announcements and other channel posts
+NOTICES = 3 # DMs, setup reminders and owner notices
+
+# Workers per priority class, a worker also runs every class above its own. Lower classes can
+# only fill their own workers, so DMs sleeping in a 429 retry never hold up role changes.
+ACTION_WORKERS = {ENFORCEMENT: 2, ROLES: 6, ANNOUNCEMENTS: 16, NOTICES: 4}
+
+class ActionQueue:
+    '''Single queue every outbound REST call from handlers and loops goes through.
+
+    Workers take from the highest priority class that has work and, inside a class, rotate between
+    servers so one busy server cannot starve the others. A server has at most one job per class in
+    flight: its requests share rate limit buckets, so a second job would only wait on the same bucket
+    while holding a worker that other servers could use.
+    '''
+
+    def __init__(self, workers=ACTION_WORKERS):
+        self.workers = workers
+        self.queues = [collections.OrderedDict() for _ in range(NOTICES + 1)]
+        self.busy = set() # (priority, guild id) with a job in flight
+        self.ready = asyncio.Event()
+        self.tasks = []
+
+    def capacity(self, priority):
+        # how many jobs of this class can run at once, concurrency limits elsewhere are tied to this
+        return sum(count for max_priority, count in self.workers.items() if max_priority >= priority)
+
+    def start(self):
+        if not self.tasks:
+            for max_priority, count in self.workers.items():
+                for _ in range(count):
+                    self.tasks.append(asyncio.ensure_future(self.worker(max_priority)))
+
+    def enqueue(self, priority, guild_id, func, *args, **kwargs):
+        # Returns a future with the call's result, await it to wait for the call or catch its error
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.queues[priority].setdefault(guild_id, collections.deque()).append((future, func, args, kwargs))
+        self.ready.set()
+        return future
+
+    def post(self, priority, guild_id, func, *args, **kwargs):
+        # Fire and forget, failures are logged instead of raised
+        future = self.enqueue(priority, guild_id, func, *args, **kwargs)
+        future.add_done_callback(self.log_failure)
+        return future
+
+    @staticmethod
+    def log_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f'Queued action failed: {future.exception()}')
+
+    def take(self, max_priority):
+        for priority, queue in enumerate(self.queues[:max_priority + 1]):
+            for guild_id, jobs in queue.items():
+                if (priority, guild_id) in self.busy:
+                    continue
+                job = jobs.popleft()
+                if jobs:
+                    queue.move_to_end(guild_id)
+                else:
+                    del queue[guild_id]
+                self.busy.add((priority, guild_id))
+                return priority, guild_id, job
+        return None
+
+    async def worker(self, max_priority):
+        while True:
+            taken = self.take(max_priority)
+            if taken is None:
+                self.ready.clear()
+                await self.ready.wait()
+                continue
+            priority, guild_id, (future, func, args, kwargs) = taken
+            try:
+                if future.done():
+                    continue
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                # the server's next job of this class can run now
+                self.busy.discard((priority, guild_id))
+                self.ready.set()
+
+
+actions = ActionQueue()
+
+background_tasks = set()
+
+def run_in_background(coro):
+    # keeps a reference so the task is not garbage collected before it finishes
+    task = asyncio.ensure_future(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+#* Sendable channel resolver
+class ChannelResolver:
+    '''Picks a channel the bot can post in from its cached permissions, without trying channels one by one.
+
+    The result is cached per server and dropped whenever channels, roles or the bot's own roles change.
+    '''
+
+    def __init__(self):
+        self.channels = {} # guild id -> channel id, or None if no channel works
+
+    @staticmethod
+    def can_send(channel):
+        permissions = channel.permissions_for(channel.guild.me)
+        return permissions.view_channel and permissions.send_messages and permissions.embed_links
+
+    def find(self, guild):
+        # the system channel first, then the top text channel
+        if guild.me is None:
+            return None
+        candidates = [guild.system_channel] if guild.system_channel is not None else []
+        candidates += guild.text_channels # already sorted by position
+        return next((channel for channel in candidates if self.can_send(channel)), None)
+
+    def resolve(self, guild):
+        if guild.id in self.channels:
+            channel_id = self.channels[guild.id]
+            return guild.get_channel(channel_id) if channel_id is not None else None
+        channel = self.find(guild)
+        self.channels[guild.id] = channel.id if channel is not None else None
+        return channel
+
+    def invalidate(self, guild_id):
+        self.channels.pop(guild_id, None)
+
+
+channel_resolver = ChannelResolver()
+
+#* Role position index
+class RolePositionIndex:
+    '''Per-server list of (position, role id) kept sorted, built once and patched from role events.'''
+
+    def __init__(self):
+        self.guilds = {} # guild id -> sorted [(position, role id)]
+
+    def entries(self, guild):
+        entries = self.guilds.get(guild.id)
+        if entries is None:
+            entries = self.guilds[guild.id] = sorted((role.position, role.id) for role in guild.roles)
+        return entries
+
+    def add(self, role):
+        if role.guild.id in self.guilds:
+            bisect.insort(self.guilds[role.guild.id], (role.position, role.id))
+
+    def remove(self, role):
+        entries = self.guilds.get(role.guild.id)
+        if entries is None:
+            return
+        index = bisect.bisect_left(entries, (role.position, role.id))
+        if index < len(entries) and entries[index] == (role.position, role.id):
+            del entries[index]
+        else:
+            # position was out of date, find it by id
+            self.guilds[role.guild.id] = [entry for entry in entries if entry[1] != role.id]
+
+    def update(self, before, after):
+        if before.position != after.position:
+            self.remove(before)
+            self.add(after)
+
+    def at(self, guild, position):
+        # ids of the roles at a position, usually one
+        entries = self.entries(guild)
+        index = bisect.bisect_left(entries, (position, 0))
+        ids = []
+        while index < len(entries) and entries[index][0] == position:
+            ids.append(entries[index][1])
+            index += 1
+        return ids
+
+    def top(self, guild):
+        entries = self.entries(guild)
+        return entries[-1][0] if entries else 0
+
+    def hierarchy(self, guild):
+        # roles from the top down
+        return [role for role in map(guild.get_role, (role_id for _, role_id in reversed(self.entries(guild)))) if role is not None]
+
+    def forget_guild(self, guild_id):
+        self.guilds.pop(guild_id, None)
+
+
+role_positions = RolePositionIndex()
+
+#* Notice coalescing
+# seconds notices to the same person are collected into one digest
+NOTICE_DIGEST_WINDOW = float(os.getenv('NOTICE_DIGEST_WINDOW', 60))
+
+class NoticeCoalescer:
+    '''Batches DMs per recipient and server.
+
+    The first notice to someone is sent straight away and opens a window; anything else for them
+    inside the window is held and sent as one digest embed when it closes. A quiet server gets the
+    same per-event DMs as before, a mass role grant gets one DM per window instead of hundreds.
+    Windows are kept apart per server and fallback, so a digest only ever falls back to a channel
+    every notice in it was allowed to be posted in.
+    '''
+
+    def __init__(self, window=NOTICE_DIGEST_WINDOW):
+        self.window = window
+        self.pending = {} # (user id, guild id, fallback guild id) -> held notices, present while a window is open
+
+    def send(self, guild_id, user, message, embed=None, fallback=None):
+        # fallback is a guild to post in (mentioning the user) if their DMs are closed
+        if user is None:
+            return
+        embeds = [embed] if embed is not None else []
+        if self.window <= 0:
+            run_in_background(self.deliver(guild_id, user, message, embeds, fallback))
+            return
+        key = (user.id, guild_id, fallback.id if fallback is not None else None)
+        held = self.pending.get(key)
+        if held is None:
+            self.pending[key] = {'guild_id': guild_id, 'user': user, 'fallback': fallback, 'notices': []}
+            run_in_background(self.deliver(guild_id, user, message, embeds, fallback))
+            run_in_background(self.close_window(key))
+        else:
+            held['notices'].append((message, embed))
+
+    async def close_window(self, key):
+        while True:
+            await asyncio.sleep(self.window)
+            held = self.pending[key]
+            if not held['notices']:
+                del self.pending[key]
+                return
+            notices, held['notices'] = held['notices'], []
+            embeds = [embed for _, embed in notices if embed is not None]
+            if len(notices) == 1:
+                await self.deliver(held['guild_id'], held['user'], notices[0][0], embeds, held['fallback'])
+            else:
+                embeds.insert(0, self.digest([message for message, _ in notices]))
+                # a message holds at most 10 embeds
+                for start in range(0, len(embeds), 10):
+                    await self.deliver(held['guild_id'], held['user'], None, embeds[start:start + 10], held['fallback'])
+            # keep the window open while notices keep coming
+
+    def digest(self, messages):
+        embed = discord.Embed(title='Role Control | Notices', description=f'{len(messages)} notices in the last {self.window:g} seconds:', color=0x00ff00)
+        description = embed.description
+        for index, message in enumerate(messages):
+            if not message:
+                continue # embed only notice, its embed goes out alongside the digest
+            line = f'\n\n{message}'
+            if len(description) + len(line) > 4000:
+                description += f'\n\n*...and {len(messages) - index} more*'
+                break
+            description += line
+        embed.description = description
+        return embed
+
+    async def deliver(self, guild_id, user, message, embeds, fallback):
+        try:
+            await actions.enqueue(NOTICES, guild_id, user.send, message, embeds=embeds)
+            return
+        except:
+            if fallback is None:
+                return
+        channel = channel_resolver.resolve(fallback)
+        if channel is not None:
+            try:
+                await actions.enqueue(NOTICES, guild_id, channel.send, f'{user.mention}\n{message}' if message else user.mention, embeds=embeds)
+                return
+            except:
+                pass
+        logger.error(f'Failed to send notice to {user} ({user.id}) of {fallback.name} ({fallback.id})')
+
+
+notifier = NoticeCoalescer()
+
+#* Intents Profile
+# BOT_PROFILE=lean (default) subscribes only to what the handlers use:
+#   guilds           - guild join/remove/update, roles and channels
+#   members          - protection (member_update), auto roles (member_join), roleusers; members are
+#                      chunked at startup and cached on join, otherwise the first role change of an
+#                      uncached member would never reach on_member_update
+#   moderation       - audit log entries used to find who gave a protected role
+#   guild/dm messages + message_content - prefix owner commands and their wait_for replies
+# Memory, lean vs full (BOT_PROFILE=full is the old Intents.all() behaviour):
+#   presences        - full keeps a status/activity record for every online member of every guild and
+#                      receives a PRESENCE_UPDATE for each change; this is usually the largest cache and
+#                      the busiest event stream. lean keeps none.
+#   message cache    - full keeps the last 1000 messages (max_messages); lean keeps none, nothing reads it.
+#   voice states     - full caches voice state per connected member; lean drops the intent.
+#   members          - both keep joined members (the role checks need them); lean stops caching members
+#                      that only show up through interactions or voice.
+#   emojis/stickers, invites, webhooks, integrations, reactions, typing, scheduled events, automod -
+#                      full receives and parses these events, lean is never sent them. The emoji cache
+#                      is only a snapshot from guild join in lean, so owner commands fetch emojis instead.
+# Compare the two on the same guilds with the `memory` owner command (RSS + cache sizes) once ready.
+BOT_PROFILE = os.getenv('BOT_PROFILE', 'lean').lower()
+
+
+def lean_intents():
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.members = True
+    intents.moderation = True
+    intents.guild_messages = True
+    intents.dm_messages = True
+    intents.message_content = True
+    return intents
+
+
+def lean_member_cache():
+    flags = discord.MemberCacheFlags.none()
+    flags.joined = True
+    return flags
+
+
+BOT_PROFILES = {
+    'lean': lambda: {'intents': lean_intents(), 'member_cache_flags': lean_member_cache(), 'max_messages': None},
+    'full': lambda: {'intents': discord.Intents.all()},
+}
+
+if BOT_PROFILE not in BOT_PROFILES:
+    logger.warning(f'Unknown BOT_PROFILE {BOT_PROFILE!r}, using lean')
+    BOT_PROFILE = 'lean'
+
+#* Sharding
+# SHARD_COUNT unset lets discord recommend a count, each shard is its own gateway connection
+SHARD_COUNT = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
 
 #* Bot Prefix
-bot = commands.Bot(command_prefix='rc-', intents=discord.Intents.all(), status=discord.Status.online, help_command=None)
+bot = commands.AutoShardedBot(command_prefix='rc-', status=discord.Status.online, help_command=None, shard_count=SHARD_COUNT, **BOT_PROFILES[BOT_PROFILE]())
 
 owner = [1036616200211411034, 652498200447549450]
 
@@ -108,10 +931,21 @@ async def on_ready():
     logger.info(f"Logged in as {bot.user.name} ({bot.user.id})")
     logger.info("Libaray: Python 3.11")
     logger.info("Prefix: rc-")
+    logger.info(f"Profile: {BOT_PROFILE}")
+    logger.info(f"Shards: {bot.shard_count}")
     logger.info("Bot Developers: " + ', '.join([str(bot.get_user(user_id)) for user_id in owner]))
     logger.info(f"Bot is ready! | Start time: {datetime.now().strftime('%d/%m/%Y %I:%M %p %Z')}")
     print("----------------------------------------")
     await bot.change_presence(activity=discord.Game(name='/help'))
+    await db.load_configs([guild.id for guild in bot.guilds])
+    await db.set_bot_roles({guild.id: guild.self_role.id for guild in bot.guilds if guild.self_role is not None})
+    await resume_broadcasts()
+    # commands have synced by now, so their IDs are known
+    help_catalog.build()
+    register_help_menus()
+    # shards without any servers never send shard_ready
+    for shard_id in bot.shards:
+        start_shard_loops(shard_id)
 
     # support_server = bot.get_guild(1158967835616362626)
     # log_channel = support_server.get_channel(1143051391946981446)
@@ -132,18 +966,63 @@ bot_start_time = datetime.utcnow()
 ## ? Functions
 
 
+#* Text file exports
+def export_file(filename, text):
+    # built in memory, so exports never touch disk and concurrent ones cannot clobber each other
+    return discord.File(io.BytesIO(text.encode('utf-8')), filename)
+
+#* Shard latencies
+def shard_latencies():
+    lines = []
+    for shard_id, latency in sorted(bot.latencies):
+        # nan/inf until the shard's first heartbeat is acknowledged
+        lines.append(f'Shard {shard_id}: ' + (f'{round(latency * 1000)}ms' if math.isfinite(latency) else 'connecting'))
+    return lines
+
+def format_shard_latencies(limit):
+    lines = shard_latencies()
+    text = '\n'.join(lines)
+    while len(text) > limit and lines:
+        lines.pop()
+        text = '\n'.join(lines) + f'\n*...and {bot.shard_count - len(lines)} more*'
+    return text
+
+#* Guild emojis
+async def get_guild_emojis(guild):
+    # without the emojis intent the cache is only a snapshot from when the guild was received
+    if bot.intents.emojis_and_stickers:
+        return guild.emojis
+    return await guild.fetch_emojis()
+
+#* Leave a blacklisted server
+async def leave_blacklisted(guild):
+    # tell the owner before leaving, the channel fallback only works while still in the server
+    try:
+        await actions.enqueue(NOTICES, guild.id, guild.owner.send, f'Your server **{guild.name}** *({guild.id})* has been blacklisted from using Role Control.\nIf you believe this is a mistake, please contact the developer. *(652498200447549450)*')
+    except:
+        channel = channel_resolver.resolve(guild)
+        if channel is not None:
+            try:
+                await actions.enqueue(NOTICES, guild.id, channel.send, f'{guild.owner.mention} This server has been blacklisted from using Role Control.\nIf you believe this is a mistake, please contact the developer. *(652498200447549450)*')
+            except:
+                pass
+    try:
+        await actions.enqueue(NOTICES, guild.id, guild.leave)
+        logger.info(f'Left blacklisted server {guild.name} ({guild.id})')
+    except Exception as e:
+        logger.error(f'Failed to leave blacklisted server {guild.name} ({guild.id}): {e}')
+
 #* Check if User Command
 def user_command(interaction: discord.Interaction):
     return True
 
 #* Check if Role Command
-def role_command(interaction: discord.Interaction):
+async def role_command(interaction: discord.Interaction):
     if interaction.guild is None:
         return True
-    c.execute('SELECT role_id FROM manager_roles WHERE server_id=?', (interaction.guild.id,))
-    manager_role_id = c.fetchone()
-    if manager_role_id:
-        manager_role = discord.utils.get(interaction.author.roles, id=manager_role_id[0])
+    manager_role_ids = (await db.get_config(interaction.guild.id)).manager
+    if manager_role_ids:
+        manager_role = discord.utils.find(lambda r: r.id in manager_role_ids, interaction.author.roles)
         if interaction.author.guild_permissions.administrator or interaction.author.id in owner:
             return True
         elif manager_role:
@@ -221,7 +1100,10 @@ async def tos(interaction: discord.Interaction):
 #* ping Command
 @bot.slash_command(name='ping', description='View the bot\'s ping.', checks=[user_command])
 async def ping(interaction: discord.Interaction):
-    await interaction.response.send_message(f'Pong! {round(bot.latency * 1000)}ms', ephemeral=True)
+    average = f'{round(bot.latency * 1000)}ms' if math.isfinite(bot.latency) else 'connecting'
+    embed = discord.Embed(title='Pong! 🏓', description=f'Average: {average}\nThis server is on shard {interaction.guild.shard_id if interaction.guild else 0}.', color=0x00ff00)
+    embed.add_field(name='Shards', value=format_shard_latencies(1024), inline=False)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
 #* myperms Command
@@ -244,13 +1126,10 @@ async def myperms(interaction: discord.Interaction):
 
     if len(perms_text) > 1024:
         perms_text = perms_text.replace('**', '')
-        with open('perms.txt', 'w') as f:
-            f.write('Permissions: ' + interaction.author.name + '\n----------------------------------\n')
-            f.write(perms_text)
+        file = export_file('perms.txt', 'Permissions: ' + interaction.author.name + '\n----------------------------------\n' + perms_text)
 
         embed.add_field(name='Permissions', value='*Too many permissions to display. Sending in a text file.*', inline=False)
-        await interaction.response.send_message(embed=embed, file=discord.File(f, 'perms.txt'), ephemeral=True)
-        os.remove('perms.txt')
+        await interaction.response.send_message(embed=embed, file=file, ephemeral=True)
     else:
         embed.add_field(name='Permissions', value=perms_text, inline=False)
         await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -258,231 +1137,125 @@ async def myperms(interaction: discord.Interaction):
 
 
 #* Help Command
-class AdminHelpView(discord.ui.View):
-    def __init__(self):
-        super().__init__(timeout=240)
-        self.current_button = None
-
-    async def on_timeout(self):
-        em = discord.Embed(title='Role Control Help - Timed Out', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ\n\n', color=discord.Colour.red())
-        em.description += f'Timed out after 4 minutes of inactivity!\n'
-        em.description += f'Use </help:1145275940008636481> to view the help menu again.'
-        try:
-            await self.message.edit(embed=em, view=None)
-        except:
-            pass
-        for child in self.children:
-            child.style = discord.ButtonStyle.grey
-            child.disabled = True
-        await self.message.edit(view=self)
-
-    async def render_buttons(self):
-        for child in self.children:
-            if child == self.current_button:
-                child.style = discord.ButtonStyle.success
-            else:
-                child.style = discord.ButtonStyle.blurple
-        await self.message.edit(view=self)
-
+class HelpCatalog:
+    '''Help embeds for each command category, built once the slash commands have synced and have IDs.'''
 
-    @discord.ui.button(label='Administrator Commands', style=discord.ButtonStyle.success, emoji='🛠️')
-    async def admin_commands(self, button: discord.ui.Button, interaction: discord.Interaction):
-        self.current_button = button
-        await self.render_buttons()
-        embed = discord.Embed(title='Role Control Help - Administrator Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
-
-        setup_commands = [
-            cmd for cmd in bot.all_commands.values() if setup_command in cmd.checks
-        ]
-
-        embed_value = ''
-        for cmd in setup_commands:
-            embed_value += f'**</{cmd.name}:{cmd.id}> :** {cmd.description}\n\n'
-
-        embed.add_field(name='Setup Commands', value=embed_value, inline=True)
-        
-        await interaction.response.edit_message(embed=embed, view=self)
-
-    @discord.ui.button(label='Manager Commands', style=discord.ButtonStyle.blurple, emoji='👑')
-    async def manager_commands(self, button: discord.ui.Button, interaction: discord.Interaction):
-        self.current_button = button
-        await self.render_buttons()
-        embed = discord.Embed(title='Role Control Help - Manager Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
-        
-        role_commands = [
-            cmd for cmd in bot.all_commands.values() if role_command in cmd.checks
-        ]
-
-        embed_value = ''
-        for cmd in role_commands:
-            embed_value += f'**</{cmd.name}:{cmd.id}> :** {cmd.description}\n\n'
-
-        embed.add_field(name='Role Management', value=embed_value, inline=True)
-        
-        await interaction.response.edit_message(embed=embed, view=self)
-
-    @discord.ui.button(label='User Commands', style=discord.ButtonStyle.blurple, emoji='👤')
-    async def user_commands(self, button: discord.ui.Button, interaction: discord.Interaction):
-        self.current_button = button
-        await self.render_buttons()
-        embed = discord.Embed(title='Role Control Help - User Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
-        
-        user_commands = [
-            cmd for cmd in bot.all_commands.values() if user_command in cmd.checks
-        ]
-
-        for cmd in user_commands:
-            embed.add_field(name=f'</{cmd.name}:{cmd.id}>', value=cmd.description, inline=False)
-        
-        await interaction.response.edit_message(embed=embed, view=self)
-
-class ManagerHelpView(discord.ui.View):
     def __init__(self):
-        super().__init__(timeout=240)
-        self.current_button = None
-
-    async def on_timeout(self):
-        em = discord.Embed(title='Role Control Help - Timed Out', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ\n\n', color=discord.Colour.red())
-        em.description += f'Timed out after 4 minutes of inactivity!\n'
-        em.description += f'Use </help:1145275940008636481> to view the help menu again.'
-        try:
-            await self.message.edit(embed=em, view=None)
-        except:
-            pass
-        for child in self.children:
-            child.style = discord.ButtonStyle.grey
-            child.disabled = True
-        await self.message.edit(view=self)
-
-    async def render_buttons(self):
-        for child in self.children:
-            if child == self.current_button:
-                child.style = discord.ButtonStyle.success
-            else:
-                child.style = discord.ButtonStyle.blurple
-        await self.message.edit(view=self)
-
+        self.embeds = {}
+        self.synced = False # every listed command had an ID when the embeds were built
+
+    def build(self):
+        categories = {'user': [], 'setup': [], 'role': []}
+        synced = True
+        for cmd in bot.all_commands.values():
+            checks = getattr(cmd, 'checks', [])
+            if any(check in checks for check in (user_command, setup_command, role_command)) and getattr(cmd, 'id', None) is None:
+                synced = False
+            if user_command in checks:
+                categories['user'].append((f'</{cmd.name}:{cmd.id}>', cmd.description))
+            if setup_command in checks:
+                categories['setup'].append((f'</{cmd.name}:{cmd.id}>', cmd.description))
+            if role_command in checks:
+                categories['role'].append((f'</{cmd.name}:{cmd.id}>', cmd.description))
+
+        embeds = {}
+        embeds['setup'] = discord.Embed(title='Role Control Help - Administrator Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
+        embeds['setup'].add_field(name='Setup Commands', value=''.join(f'**{mention} :** {description}\n\n' for mention, description in categories['setup']), inline=True)
+        embeds['role'] = discord.Embed(title='Role Control Help - Manager Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
+        embeds['role'].add_field(name='Role Management', value=''.join(f'**{mention} :** {description}\n\n' for mention, description in categories['role']), inline=True)
+        embeds['user'] = discord.Embed(title='Role Control Help - User Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
+        for mention, description in categories['user']:
+            embeds['user'].add_field(name=mention, value=description, inline=False)
+        self.embeds = embeds
+        self.synced = synced
+
+    def embed(self, category):
+        # help can be used before commands have synced, keep rebuilding until the mentions have IDs
+        if not self.synced:
+            self.build()
+        return self.embeds[category]
+
+
+help_catalog = HelpCatalog()
+
+class HelpMenu(discord.ui.View):
+    '''Help navigation buttons, created and registered once and shared by every help message.
+
+    Clicks are routed by custom_id and only swap in a prebuilt embed, so nothing is kept per
+    message, nothing times out and there are no timeout edits.
+    '''
+
+    # Ephemeral sends give views without a timeout a 15 minute one, a shared view must never time out
+    timeout = property(lambda self: None, lambda self, value: None)
+
+    def __init__(self, *categories):
+        super().__init__(timeout=None)
+        for category, button in (('setup', self.admin_commands), ('role', self.manager_commands), ('user', self.user_commands)):
+            if category not in categories:
+                self.remove_item(button)
+
+    @discord.ui.button(label='Administrator Commands', custom_id='help:setup', style=discord.ButtonStyle.blurple, emoji='🛠️')
+    async def admin_commands(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await interaction.response.edit_message(embed=help_catalog.embed('setup'))
 
-    @discord.ui.button(label='Manager Commands', style=discord.ButtonStyle.success, emoji='👑')
+    @discord.ui.button(label='Manager Commands', custom_id='help:role', style=discord.ButtonStyle.blurple, emoji='👑')
     async def manager_commands(self, button: discord.ui.Button, interaction: discord.Interaction):
-        self.current_button = button
-        await self.render_buttons()
-        embed = discord.Embed(title='Role Control Help - Manager Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
-        
-        role_commands = [
-            cmd for cmd in bot.all_commands.values() if role_command in cmd.checks
-        ]
-
-        embed_value = ''
-        for cmd in role_commands:
-            embed_value += f'**</{cmd.name}:{cmd.id}> :** {cmd.description}\n\n'
-
-        embed.add_field(name='Role Management', value=embed_value, inline=True)
-        
-        await interaction.response.edit_message(embed=embed, view=self)
+        await interaction.response.edit_message(embed=help_catalog.embed('role'))
 
-    @discord.ui.button(label='User Commands', style=discord.ButtonStyle.blurple, emoji='👤')
+    @discord.ui.button(label='User Commands', custom_id='help:user', style=discord.ButtonStyle.blurple, emoji='👤')
     async def user_commands(self, button: discord.ui.Button, interaction: discord.Interaction):
-        self.current_button = button
-        await self.render_buttons()
-        embed = discord.Embed(title='Role Control Help - User Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
-        
-        user_commands = [
-            cmd for cmd in bot.all_commands.values() if user_command in cmd.checks
-        ]
+        await interaction.response.edit_message(embed=help_catalog.embed('user'))
 
-        for cmd in user_commands:
-            embed.add_field(name=f'</{cmd.name}:{cmd.id}>', value=cmd.description, inline=False)
+help_menus = {}
 
-        await interaction.response.edit_message(embed=embed, view=self)
+def register_help_menus():
+    # Views need the event loop, so this runs on the first shard connecting (and lazily from help), once
+    if help_menus:
+        return
+    help_menus['admin'] = HelpMenu('setup', 'role', 'user')
+    help_menus['manager'] = HelpMenu('role', 'user')
+    for view in help_menus.values():
+        bot.add_view(view)
 
-class HelpView(discord.ui.View):
-    def __init__(self):
-        super().__init__(timeout=240)
-        self.current_button = None
-
-    async def on_timeout(self):
-        em = discord.Embed(title='Role Control Help - Timed Out', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ\n\n', color=discord.Colour.red())
-        em.description += f'Timed out after 4 minutes of inactivity!\n'
-        em.description += f'Use </help:1145275940008636481> to view the help menu again.'
-        try:
-            await self.message.edit(embed=em, view=None)
-        except:
-            pass
+@bot.listen('on_connect')
+async def register_help_menus_on_connect():
+    # a listener, so the default on_connect still syncs commands; on_ready can be minutes away with many shards
+    register_help_menus()
 
 
 @bot.slash_command(name='help', description='View available commands.', checks=[user_command])
 async def help(interaction: discord.Interaction):
-
-    user_commands = [
-        cmd for cmd in bot.all_commands.values() if user_command in cmd.checks
-    ]
-    setup_commands = [
-        cmd for cmd in bot.all_commands.values() if setup_command in cmd.checks
-    ]
-    role_commands = [
-        cmd for cmd in bot.all_commands.values() if role_command in cmd.checks
-    ]
+    register_help_menus()
 
     # if they have admin perms
     if interaction.guild is None:
-        embed = discord.Embed(title='Role Control Help - Manager Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
-        
-        embed_value = ''
-        for cmd in setup_commands:
-            embed_value += f'**</{cmd.name}:{cmd.id}> :** {cmd.description}\n\n'
+        embed = help_catalog.embed('setup')
 
-        embed.add_field(name='Setup Commands', value=embed_value, inline=True)
-        
-        return await interaction.response.send_message(embed=embed, view=AdminHelpView(), ephemeral=True)
-    manager_role_id = c.fetchone()
-    if manager_role_id:
-        manager_role = discord.utils.get(interaction.author.roles, id=manager_role_id[0])
+        return await interaction.response.send_message(embed=embed, view=help_menus['admin'], ephemeral=True)
+    manager_role_ids = (await db.get_config(interaction.guild.id)).manager
+    if manager_role_ids:
+        manager_role = discord.utils.find(lambda r: r.id in manager_role_ids, interaction.author.roles)
         if interaction.author.guild_permissions.administrator or interaction.author.id in owner:
-            embed = discord.Embed(title='Role Control Help - Manager Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
-            
-            embed_value = ''
-            for cmd in setup_commands:
-                embed_value += f'**</{cmd.name}:{cmd.id}> :** {cmd.description}\n\n'
-
-            embed.add_field(name='Setup Commands', value=embed_value, inline=True)
-            
-            await interaction.response.send_message(embed=embed, view=AdminHelpView(), ephemeral=True)
+            embed = help_catalog.embed('setup')
+
+            await interaction.response.send_message(embed=embed, view=help_menus['admin'], ephemeral=True)
         elif manager_role:
-            embed = discord.Embed(title='Role Control Help - Manager Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
-            
-            embed_value = ''
-            for cmd in role_commands:
-                embed_value += f'**</{cmd.name}:{cmd.id}> :** {cmd.description}\n\n'
-
-            embed.add_field(name='Role Management', value=embed_value, inline=True)
-            
-            await interaction.response.send_message(embed=embed, view=ManagerHelpView(), ephemeral=True)
+            embed = help_catalog.embed('role')
+
+            await interaction.response.send_message(embed=embed, view=help_menus['manager'], ephemeral=True)
         else:
-            embed = discord.Embed(title='Role Control Help - User Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
-            
-            for cmd in user_commands:
-                embed.add_field(name=f'</{cmd.name}:{cmd.id}>', value=cmd.description, inline=False)
+            embed = help_catalog.embed('user')
 
-            await interaction.response.send_message(embed=embed, view=HelpView(), ephemeral=True)
+            await interaction.response.send_message(embed=embed, ephemeral=True)
     else:
         if interaction.author.guild_permissions.administrator or interaction.author.id in owner:
-            embed = discord.Embed(title='Role Control Help - Manager Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
-            
-            embed_value = ''
-            for cmd in setup_commands:
-                embed_value += f'**</{cmd.name}:{cmd.id}> :** {cmd.description}\n\n'
-
-            embed.add_field(name='Setup Commands', value=embed_value, inline=True)
-            
-            await interaction.response.send_message(embed=embed, view=AdminHelpView(), ephemeral=True)
+            embed = help_catalog.embed('setup')
+
+            await interaction.response.send_message(embed=embed, view=help_menus['admin'], ephemeral=True)
         else:
-            embed = discord.Embed(title='Role Control Help - User Commands', description='Discord Bot to control & manage roles.\nSupport server: https://discord.gg/9HtyP4SJVJ', color=0x00ff00)
-            
-            for cmd in user_commands:
-                embed.add_field(name=f'</{cmd.name}:{cmd.id}>', value=cmd.description, inline=False)
+            embed = help_catalog.embed('user')
 
-            await interaction.response.send_message(embed=embed, view=HelpView(), ephemeral=True)
+            await interaction.response.send_message(embed=embed, ephemeral=True)
 
 #* Invite Command
 @bot.slash_command(name='invite', description='Invite the bot to your server.', checks=[user_command])
@@ -525,6 +1298,7 @@ async def uptime(interaction: discord.Interaction):
     embed = discord.Embed(title='Role Control | Uptime 🕐', color=0x00ff00)
     embed.add_field(name='Current Uptime', value=uptime_str, inline=False)
     embed.add_field(name='Started', value=start_time_formatted, inline=False)
+    embed.add_field(name='Shards', value=format_shard_latencies(1024), inline=False)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 #* Setup Command (Admin Only)
@@ -543,42 +1317,22 @@ async def setup(
     if interaction.guild is None:
         return await interaction.response.send_message('**Error:** `This command cannot be used in private messages.`', ephemeral=True)
 
-    c.execute('SELECT role_id FROM roles WHERE server_id=?', (interaction.guild.id,))
-    roles = c.fetchall()
-    c.execute('SELECT role_id FROM auto WHERE server_id=?', (interaction.guild.id,))
-    auto_roles = c.fetchall()
-    c.execute('SELECT role_id FROM bypass WHERE server_id=?', (interaction.guild.id,))
-    bypass_roles = c.fetchall()
-    c.execute('SELECT channel_id FROM announcements WHERE server_id=?', (interaction.guild.id,))
-    channel_id = c.fetchall()
-    c.execute('SELECT role_id FROM manager_roles WHERE server_id=?', (interaction.guild.id,))
-    managers = c.fetchall()
-
-    if channel_id not in [None, []]:
+    channel_id = await db.get_announcement_channel(interaction.guild.id)
+
+    if channel_id is not None:
         return await interaction.response.send_message('You have already setup the bot for your server.\n> If you wish to reset the bot, use </reset:1145275940168024084>.', ephemeral=True)
     
     if ((protect == auto and protect is not None) or (protect == manager and protect is not None) or (protect == bypass and protect is not None) or (auto == manager and auto is not None) or (auto == bypass and auto is not None)):
         return await interaction.response.send_message('I\'m sorry but you can\'t use the same role twice *(Manager & Bypass can be the same)*.\n> Please try again!', ephemeral=True)
 
-    if protect is None:
-        pass
-    else:
-        c.execute('INSERT INTO roles VALUES (?, ?)', (interaction.guild.id, protect.id))
-    if bypass is None:
-        pass
-    else:
-        c.execute('INSERT INTO bypass VALUES (?, ?)', (interaction.guild.id, bypass.id))
-    if auto is None:
-        pass
-    else:
-        c.execute('INSERT INTO auto VALUES (?, ?)', (interaction.guild.id, auto.id))
-    if manager is None:
-        pass
-    else:
-        c.execute('INSERT INTO manager_roles VALUES (?, ?)', (interaction.guild.id, manager.id))
-
-    c.execute('INSERT INTO announcements VALUES (?, ?)', (interaction.guild.id, channel.id))
-    conn.commit()
+    await db.setup_guild(
+        interaction.guild.id,
+        channel.id,
+        protect=protect.id if protect else None,
+        bypass=bypass.id if bypass else None,
+        auto=auto.id if auto else None,
+        manager=manager.id if manager else None
+    )
         
 
     await interaction.response.send_message('Thank you for setting up the bot for your server.\nIf you wish to change the roles the bot is controlling, use </addrole:1145275940008636483> or </removerole:1145275940008636484>.\nYou can also change the Announcement channel using </setchannel:1145275940008636485>.\n> If you wish to reset the bot, use </reset:1145275940168024084>.', ephemeral=True)
@@ -623,20 +1377,17 @@ async def setup(
 async def setchannel(interaction: discord.Interaction, channel: Option(discord.TextChannel, description='Announcement channel.', required=True)):
     if interaction.guild is None:
         return await interaction.response.send_message('**Error:** `This command cannot be used in private messages.`', ephemeral=True)
-    c.execute('SELECT channel_id FROM announcements WHERE server_id=?', (interaction.guild.id,))
-    channels = c.fetchall()
-    if len(channels) == 0:
-        c.execute('INSERT INTO announcements VALUES (?, ?)', (interaction.guild.id, channel.id))
+    channel_id = await db.get_announcement_channel(interaction.guild.id)
+    if channel_id is None:
+        await db.set_announcement_channel(interaction.guild.id, channel.id)
         await interaction.response.send_message(f'Set channel `{channel}` as **Announcements Channel**.', ephemeral=True)
-    elif channels[0][0] == channel.id:
+    elif channel_id == channel.id:
         await interaction.response.send_message(f'Channel `{channel}` is already set to **Announcements Channel**.', ephemeral=True)
         return
     else:
-        c.execute('SELECT channel_id FROM announcements WHERE server_id=?', (interaction.guild.id,))
-        channel_id = c.fetchone()
-        c.execute('UPDATE announcements SET channel_id=? WHERE server_id=?', (channel.id, interaction.guild.id))
+        await db.set_announcement_channel(interaction.guild.id, channel.id)
         try:
-            old_channel = bot.get_channel(channel_id[0])
+            old_channel = bot.get_channel(channel_id)
             old_channel = f"**{old_channel.name}** *(`{old_channel.id}`)*"
         except:
             old_channel = 'None'
@@ -655,8 +1406,6 @@ async def setchannel(interaction: discord.Interaction, channel: Option(discord.T
     #     embed.add_field(name='New Channel', value=f'{channel.name} *(`{channel.id}`)*', inline=False)
     # await setup.send(embed=embed)
 
-    conn.commit()
-
 #* Add Role Command (Admin Only)
 @bot.slash_command(name='addrole', description='Add a role the bot will control, auto assign, or ignore.', checks=[setup_command])
 async def addrole(interaction: discord.Interaction, type: Option(str, description='Type of role to add.', required=True, choices=['protected', 'bypass', 'auto', 'manager']), role: Option(discord.Role, description='Role to add.', required=True)):
@@ -667,73 +1416,62 @@ async def addrole(interaction: discord.Interaction, type: Option(str, descriptio
     else:
         if not interaction.author.guild_permissions.administrator:
             return await interaction.response.send_message('**Error:** `You do not have permission to use this command.`', ephemeral=True)
-    c.execute('SELECT role_id FROM roles WHERE server_id=?', (interaction.guild.id,))
-    roles = c.fetchall()
-    c.execute('SELECT role_id FROM auto WHERE server_id=?', (interaction.guild.id,))
-    auto_roles = c.fetchall()
-    c.execute('SELECT role_id FROM bypass WHERE server_id=?', (interaction.guild.id,))
-    bypass_roles = c.fetchall()
-    c.execute('SELECT role_id FROM manager_roles WHERE server_id=?', (interaction.guild.id,))
-    managers = c.fetchall()
-    c.execute('SELECT channel_id FROM announcements WHERE server_id=?', (interaction.guild.id,))
-    channel_id = c.fetchone()
+    config = await db.get_config(interaction.guild.id)
+    roles, auto_roles, bypass_roles, managers = config.protected, config.auto, config.bypass, config.manager
+    channel_id = config.channel
     if channel_id is None:
         return await interaction.response.send_message('You have not setup the bot for your server. Use </setup:1146779160996483114> to setup the bot for your server.', ephemeral=True)
     if type.lower() == 'protected':
-        if role.id in [r[0] for r in roles]:
+        if role.id in roles:
             return await interaction.response.send_message('That role is already in the database.', ephemeral=True)
-        if role.id in [r[0] for r in auto_roles] or role.id in [r[0] for r in bypass_roles] or role.id in [r[0] for r in managers]:
+        if role.id in auto_roles or role.id in bypass_roles or role.id in managers:
             # get what type of role it is
-            if role.id in [r[0] for r in auto_roles]:
+            if role.id in auto_roles:
                 type = 'Auto'
-            elif role.id in [r[0] for r in bypass_roles]:
+            elif role.id in bypass_roles:
                 type = 'Bypass'
-            elif role.id in [r[0] for r in managers]:
+            elif role.id in managers:
                 type = 'Manager'
             return await interaction.response.send_message(f'That role is already in the database as a **{type} Role**.', ephemeral=True)
-        c.execute('INSERT INTO roles VALUES (?, ?)', (interaction.guild.id, role.id))
-        conn.commit()
+        await db.add_role('protected', interaction.guild.id, role.id)
         await interaction.response.send_message(f'Role `{role}` added to database.\nThe bot will now protect this role from users.', ephemeral=True)
     elif type.lower() == 'bypass':
-        if role.id in [r[0] for r in bypass_roles]:
+        if role.id in bypass_roles:
             return await interaction.response.send_message('That role is already in the database.', ephemeral=True)
-        if role.id in [r[0] for r in roles] or role.id in [r[0] for r in auto_roles]:
+        if role.id in roles or role.id in auto_roles:
             # get what type of role it is
-            if role.id in [r[0] for r in auto_roles]:
+            if role.id in auto_roles:
                 type = 'Auto'
-            elif role.id in [r[0] for r in roles]:
+            elif role.id in roles:
                 type = 'Protected'
             return await interaction.response.send_message(f'That role is already in the database as a **{type} Role**.', ephemeral=True)
-        c.execute('INSERT INTO bypass VALUES (?, ?)', (interaction.guild.id, role.id))
-        conn.commit()
+        await db.add_role('bypass', interaction.guild.id, role.id)
         await interaction.response.send_message(f'Role `{role}` added to database.\nUsers with this role will now bypass the bot.', ephemeral=True)
     elif type.lower() == 'auto':
-        if role.id in [r[0] for r in auto_roles]:
+        if role.id in auto_roles:
             return await interaction.response.send_message('That role is already in the database.', ephemeral=True)
-        if role.id in [r[0] for r in roles] or role.id in [r[0] for r in bypass_roles] or role.id in [r[0] for r in managers]:
+        if role.id in roles or role.id in bypass_roles or role.id in managers:
             # get what type of role it is
-            if role.id in [r[0] for r in roles]:
+            if role.id in roles:
                 type = 'Protected'
-            elif role.id in [r[0] for r in bypass_roles]:
+            elif role.id in bypass_roles:
                 type = 'Bypass'
-            elif role.id in [r[0] for r in managers]:
+            elif role.id in managers:
                 type = 'Manager'
             return await interaction.response.send_message(f'That role is already in the database as a **{type} Role**.', ephemeral=True)
-        c.execute('INSERT INTO auto VALUES (?, ?)', (interaction.guild.id, role.id))
-        conn.commit()
+        await db.add_role('auto', interaction.guild.id, role.id)
         await interaction.response.send_message(f'Role `{role}` added to database.\nThe bot will now auto assign this role to new users.', ephemeral=True)
     elif type.lower() == 'manager':
-        if role.id in [r[0] for r in managers]:
+        if role.id in managers:
             return await interaction.response.send_message('That role is already in the database.', ephemeral=True)
-        if role.id in [r[0] for r in roles] or role.id in [r[0] for r in auto_roles]:
+        if role.id in roles or role.id in auto_roles:
             # get what type of role it is
-            if role.id in [r[0] for r in roles]:
+            if role.id in roles:
                 type = 'Protected'
-            elif role.id in [r[0] for r in auto_roles]:
+            elif role.id in auto_roles:
                 type = 'Auto'
             return await interaction.response.send_message(f'That role is already in the database as a **{type}** Role.', ephemeral=True)
-        c.execute('INSERT INTO manager_roles VALUES (?, ?)', (interaction.guild.id, role.id))
-        conn.commit()
+        await db.add_role('manager', interaction.guild.id, role.id)
         await interaction.response.send_message(f'Role `{role}` added to database.\nUsers with this role can now manage the bot.', ephemeral=True)
     else:
         await interaction.response.send_message('Invalid type. Use `protected`, `bypass`, or `auto`.\n</addrole:1145275940008636483>', ephemeral=True)
@@ -754,9 +1492,7 @@ class RemoveRoleView(discord.ui.View):
 
     @discord.ui.button(label='Both', custom_id='both', style=discord.ButtonStyle.blurple)
     async def both(self, button: discord.ui.Button, interaction: discord.Interaction):
-        c.execute('DELETE FROM manager_roles WHERE role_id=?', (self.role.id,))
-        c.execute('DELETE FROM bypass WHERE role_id=?', (self.role.id,))
-        conn.commit()
+        await db.remove_roles(['manager', 'bypass'], self.role.guild.id, self.role.id)
         await interaction.response.edit_message(content=f'Role `{self.role}` removed from **Manager Roles** and **Bypass Roles**.', view=None)
 
         # support_server = bot.get_guild(1158967835616362626) # Role Control Support Server
@@ -768,8 +1504,7 @@ class RemoveRoleView(discord.ui.View):
 
     @discord.ui.button(label='Manager', custom_id='manager', style=discord.ButtonStyle.green)
     async def manager(self, button: discord.ui.Button, interaction: discord.Interaction):
-        c.execute('DELETE FROM manager_roles WHERE role_id=?', (self.role.id,))
-        conn.commit()
+        await db.remove_role('manager', self.role.guild.id, self.role.id)
         await interaction.response.edit_message(content=f'Role `{self.role}` removed from **Manager Roles**.', view=None)
 
         # support_server = bot.get_guild(1158967835616362626) # Role Control Support Server
@@ -781,8 +1516,7 @@ class RemoveRoleView(discord.ui.View):
 
     @discord.ui.button(label='Bypass', custom_id='bypass', style=discord.ButtonStyle.green)
     async def bypass(self, button: discord.ui.Button, interaction: discord.Interaction):
-        c.execute('DELETE FROM bypass WHERE role_id=?', (self.role.id,))
-        conn.commit()
+        await db.remove_role('bypass', self.role.guild.id, self.role.id)
         await interaction.response.edit_message(content=f'Role `{self.role}` removed from **Bypass Roles**.', view=None)
 
         # support_server = bot.get_guild(1158967835616362626) # Role Control Support Server
@@ -808,48 +1542,37 @@ async def removerole(
     else:
         if not interaction.author.guild_permissions.administrator:
             return await interaction.response.send_message('**Error:** `You do not have permission to use this command.`', ephemeral=True)
-    c.execute('SELECT role_id FROM roles WHERE server_id=?', (interaction.guild.id,))
-    roles = c.fetchall()
-    c.execute('SELECT role_id FROM auto WHERE server_id=?', (interaction.guild.id,))
-    auto_roles = c.fetchall()
-    c.execute('SELECT role_id FROM bypass WHERE server_id=?', (interaction.guild.id,))
-    bypass_roles = c.fetchall()
-    c.execute('SELECT role_id FROM manager_roles WHERE server_id=?', (interaction.guild.id,))
-    managers = c.fetchall()
-    c.execute('SELECT channel_id FROM announcements WHERE server_id=?', (interaction.guild.id,))
-    channel_id = c.fetchone()
+    config = await db.get_config(interaction.guild.id)
+    roles, auto_roles, bypass_roles, managers = config.protected, config.auto, config.bypass, config.manager
+    channel_id = config.channel
     if channel_id is None:
         return await interaction.response.send_message('You have not setup the bot for your server. Use </setup:1146779160996483114> to setup the bot for your server.', ephemeral=True)
     # check what type of role it is
-    if role.id in [r[0] for r in roles]:
+    if role.id in roles:
         type = 'Protected'
-    elif role.id in [r[0] for r in auto_roles]:
+    elif role.id in auto_roles:
         type = 'Auto'
-    elif role.id in [r[0] for r in bypass_roles]:
+    elif role.id in bypass_roles:
         type = 'Bypass'
-    elif role.id in [r[0] for r in managers]:
+    elif role.id in managers:
         type = 'Manager'
     else:
         return await interaction.response.send_message('Role is not in database.', ephemeral=True)
     
-    if type == 'Manager' and role.id in [r[0] for r in bypass_roles] or type == 'Bypass' and role.id in [r[0] for r in managers]:
+    if type == 'Manager' and role.id in bypass_roles or type == 'Bypass' and role.id in managers:
         return await interaction.response.send_message(f'Role `{role}` is in both **Manager Roles** and **Bypass Roles**.\n> Which one do you want to remove it from?', view=RemoveRoleView(role=role), ephemeral=True)
     
     if type == 'Protected':
-        c.execute('DELETE FROM roles WHERE role_id=?', (role.id,))
-        conn.commit()
+        await db.remove_role('protected', interaction.guild.id, role.id)
         await interaction.response.send_message(f'Role `{role}` removed from **{type} Roles**.\nThe bot will no longer protect this role from users.', ephemeral=True)
     elif type == 'Auto':
-        c.execute('DELETE FROM auto WHERE role_id=?', (role.id,))
-        conn.commit()
+        await db.remove_role('auto', interaction.guild.id, role.id)
         await interaction.response.send_message(f'Role `{role}` removed from **{type} Roles**.\nThe bot will no longer auto assign this role to new users.', ephemeral=True)
     elif type == 'Bypass':
-        c.execute('DELETE FROM bypass WHERE role_id=?', (role.id,))
-        conn.commit()
+        await db.remove_role('bypass', interaction.guild.id, role.id)
         await interaction.response.send_message(f'Role `{role}` removed from **{type} Roles**.\nUsers with this role will no longer bypass the bot.', ephemeral=True)
     elif type == 'Manager':
-        c.execute('DELETE FROM manager_roles WHERE role_id=?', (role.id,))
-        conn.commit()
+        await db.remove_role('manager', interaction.guild.id, role.id)
         await interaction.response.send_message(f'Role `{role}` removed from **{type} Roles**.\nUsers with this role can no longer manage the bot.', ephemeral=True)
 
     # support_server = bot.get_guild(1158967835616362626) # Role Control Support Server
@@ -867,11 +1590,7 @@ async def removenulls(interaction: discord.Interaction):
     else:
         if not interaction.author.guild_permissions.administrator:
             return await interaction.response.send_message('**Error:** `You do not have permission to use this command.`', ephemeral=True)
-    c.execute('DELETE FROM roles WHERE role_id=0')
-    c.execute('DELETE FROM auto WHERE role_id=0')
-    c.execute('DELETE FROM bypass WHERE role_id=0')
-    c.execute('DELETE FROM manager_roles WHERE role_id=0')
-    conn.commit()
+    await db.remove_null_roles()
     await interaction.response.send_message('Removed all \'0\'s *(Invalid Roles)* from the database.', ephemeral=True)
 
     # support_server = bot.get_guild(1158967835616362626) # Role Control Support Server
@@ -884,12 +1603,11 @@ async def removenulls(interaction: discord.Interaction):
 async def showsetup(interaction: discord.Interaction):
     if interaction.guild is None:
         return await interaction.response.send_message('**Error:** `This command cannot be used in private messages.`', ephemeral=True)
-    c.execute('SELECT role_id FROM manager_roles WHERE server_id=?', (interaction.guild.id,))
-    manager_role_id = c.fetchone()
+    manager_role_ids = (await db.get_config(interaction.guild.id)).manager
     if interaction.author.guild_permissions.administrator or interaction.author.id in owner:
         pass
-    elif manager_role_id:
-        manager_role = discord.utils.get(interaction.author.roles, id=manager_role_id[0])
+    elif manager_role_ids:
+        manager_role = discord.utils.find(lambda r: r.id in manager_role_ids, interaction.author.roles)
         if manager_role:
             pass
         else:
@@ -897,16 +1615,9 @@ async def showsetup(interaction: discord.Interaction):
     else:
         return await interaction.response.send_message('**Error:** `You do not have permission to use this command.`', ephemeral=True)
     
-    c.execute('SELECT role_id FROM roles WHERE server_id=?', (interaction.guild.id,))
-    roles = c.fetchall()
-    c.execute('SELECT role_id FROM auto WHERE server_id=?', (interaction.guild.id,))
-    auto_roles = c.fetchall()
-    c.execute('SELECT role_id FROM bypass WHERE server_id=?', (interaction.guild.id,))
-    bypass_roles = c.fetchall()
-    c.execute('SELECT role_id FROM manager_roles WHERE server_id=?', (interaction.guild.id,))
-    managers = c.fetchall()
-    c.execute('SELECT channel_id FROM announcements WHERE server_id=?', (interaction.guild.id,))
-    channel_id = c.fetchone()
+    config = await db.get_config(interaction.guild.id)
+    roles, auto_roles, bypass_roles, managers = config.protected, config.auto, config.bypass, config.manager
+    channel_id = config.channel
 
     if channel_id is None:
         return await interaction.response.send_message('You have not set up the bot for your server. Use </setup:1146779160996483114> to set up the bot for your server.', ephemeral=True)
@@ -914,13 +1625,13 @@ async def showsetup(interaction: discord.Interaction):
     embed = discord.Embed(title='Role Control | Roles', description='Discord Bot to control & manage roles.', color=0x00ff00)
 
     for role_list, name in [(roles, 'Roles'), (auto_roles, 'Auto Roles'), (bypass_roles, 'Bypass Roles'), (managers, 'Manager Roles')]:
-        formatted_roles = '\n'.join([f'<a:arrowr:1138793180494581841> <@&{role[0]}> *(`{role[0]}`)*' for role in role_list])
+        formatted_roles = '\n'.join([f'<a:arrowr:1138793180494581841> <@&{role}> *(`{role}`)*' for role in sorted(role_list)])
         if formatted_roles:
             embed.add_field(name=name, value=formatted_roles, inline=False)
         else:
             embed.add_field(name=name, value='None', inline=False)
 
-    embed.add_field(name='Announcement Channel', value=f'<#{channel_id[0]}> *({channel_id[0]})*', inline=False)
+    embed.add_field(name='Announcement Channel', value=f'<#{channel_id}> *({channel_id})*', inline=False)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 #* Role Info Command (Admin Only)
@@ -928,49 +1639,33 @@ async def showsetup(interaction: discord.Interaction):
 async def roleinfo(interaction: discord.Interaction, role: Option(discord.Role, description='Role to get info about.', required=True)):
     if interaction.guild is None:
         return await interaction.response.send_message('**Error:** `This command cannot be used in private messages.`', ephemeral=True)
-    c.execute('SELECT role_id FROM manager_roles WHERE server_id=?', (interaction.guild.id,))
-    manager_role_id = c.fetchone()
+    manager_role_ids = (await db.get_config(interaction.guild.id)).manager
     if interaction.author.guild_permissions.administrator or interaction.author.id in owner:
         pass
-    elif manager_role_id:
-        manager_role = discord.utils.get(interaction.author.roles, id=manager_role_id[0])
+    elif manager_role_ids:
+        manager_role = discord.utils.find(lambda r: r.id in manager_role_ids, interaction.author.roles)
         if manager_role:
             pass
         else:
             return await interaction.response.send_message('**Error:** `You do not have permission to use this command.`', ephemeral=True)
     else:
         return await interaction.response.send_message('**Error:** `You do not have permission to use this command.`', ephemeral=True)
-    c.execute('SELECT role_id FROM roles WHERE server_id=?', (interaction.guild.id,))
-    roles = c.fetchall()
-    c.execute('SELECT role_id FROM auto WHERE server_id=?', (interaction.guild.id,))
-    auto_roles = c.fetchall()
-    c.execute('SELECT role_id FROM bypass WHERE server_id=?', (interaction.guild.id,))
-    bypass_roles = c.fetchall()
     embed = discord.Embed(title=f'Role Info | {role.name}', description=f'Role ID: {role.id}', color=role.color)
     # position (display position number and role above and below
     # get roles above and below
-    roles_above = []
-    roles_below = []
-    max_position = 0
-
-    # display name of role above and below
-    for r in interaction.guild.roles:
-        if r.position == role.position - 1:
-            roles_above.append(r.name)
-        if r.position == role.position + 1:
-            roles_below.append(r.name)
-        if r.position > max_position:
-            max_position = r.position
+    roles_above = [r.name for r in map(interaction.guild.get_role, role_positions.at(interaction.guild, role.position - 1)) if r is not None]
+    roles_below = [r.name for r in map(interaction.guild.get_role, role_positions.at(interaction.guild, role.position + 1)) if r is not None]
+    max_position = role_positions.top(interaction.guild)
+
     if len(roles_above) == 0:
         roles_above = 'None'
     if len(roles_below) == 0:
         roles_below = 'None'
 
     # check if the role is below the bot's highest role
-    c.execute('SELECT role_id FROM bot_role WHERE server_id=?', (interaction.guild.id,))
-    bot_role_id = c.fetchone()
+    bot_role_id = await db.get_bot_role(interaction.guild.id)
     try:
-        bot_role = discord.utils.get(interaction.guild.roles, id=bot_role_id[0])
+        bot_role = interaction.guild.get_role(bot_role_id)
     except:
         bot_role = None
         logger.error(f'Error getting bot role in roleinfo command: {bot_role}')
@@ -1009,62 +1704,96 @@ async def roleinfo(interaction: discord.Interaction, role: Option(discord.Role,
                 permstxt.append(f'- {perm[0]}')
         permstxt = '\n'.join(permstxt)
         permstxt = str(permstxt).replace('[', '').replace(']', '').replace('(', '').replace(')', '').replace(',', '').replace("'", '')
-        with open('perms.txt', 'w') as f:
-            f.write('Permissions for the role: ' + role.name + '\n----------------------------------\n')
-            f.write(permstxt)
-        with open('perms.txt', 'rb') as f:
-            embed.add_field(name='Permissions', value=f'*Too many permissions to display. Sending in a text file.*', inline=False)
-            await interaction.response.send_message(embed=embed, file=discord.File(f, 'perms.txt'), ephemeral=True)
-        os.remove('perms.txt')
+        file = export_file('perms.txt', 'Permissions for the role: ' + role.name + '\n----------------------------------\n' + permstxt)
+        embed.add_field(name='Permissions', value=f'*Too many permissions to display. Sending in a text file.*', inline=False)
+        await interaction.response.send_message(embed=embed, file=file, ephemeral=True)
     else:
         embed.add_field(name='Permissions', value=f'Perms the role has:\n{perms}', inline=False)
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 #* Role Users Command (Managers Only)
+ROLE_USERS_PAGE_SIZE = 20
+ROLE_USERS_TTL = 60 # seconds a role's member list is reused between pages and calls
+
+class RoleMemberSnapshots:
+    '''Sorted member ID lists per role, kept for a short time so paging through a huge role only walks it once.'''
+
+    def __init__(self, ttl=ROLE_USERS_TTL):
+        self.ttl = ttl
+        self.snapshots = {} # (guild id, role id) -> (expires, sorted member ids)
+
+    def get(self, role):
+        now = time.monotonic()
+        for key in [key for key, (expires, _) in self.snapshots.items() if expires <= now]:
+            del self.snapshots[key]
+        key = (role.guild.id, role.id)
+        if key not in self.snapshots:
+            self.snapshots[key] = (now + self.ttl, sorted(member.id for member in role.members))
+        return self.snapshots[key][1]
+
+
+role_member_snapshots = RoleMemberSnapshots()
+
+def role_user_lines(guild, member_ids, start):
+    # one line per member from start onwards, only as far as the caller reads
+    for index in range(start, len(member_ids)):
+        member = guild.get_member(member_ids[index])
+        yield f'- **{member.name}** *({member.id})*' if member is not None else f'- *Left the server* *({member_ids[index]})*'
+
+def role_users_embed(role, member_ids, page):
+    pages = max(1, -(-len(member_ids) // ROLE_USERS_PAGE_SIZE))
+    lines = itertools.islice(role_user_lines(role.guild, member_ids, page * ROLE_USERS_PAGE_SIZE), ROLE_USERS_PAGE_SIZE)
+    embed = discord.Embed(title=f'Role Users | {role.name}', description=f'Role ID: {role.id}\n\n' + ('\n'.join(lines) or '*No users have this role.*'), color=role.color)
+    embed.set_footer(text=f'Page {page + 1}/{pages} | {len(member_ids)} users')
+    return embed
+
+class RoleUsersView(discord.ui.View):
+    def __init__(self, role, member_ids):
+        super().__init__(timeout=180)
+        self.role = role
+        self.member_ids = member_ids
+        self.page = 0
+        self.pages = max(1, -(-len(member_ids) // ROLE_USERS_PAGE_SIZE))
+        self.update_buttons()
+
+    def update_buttons(self):
+        self.previous.disabled = self.page == 0
+        self.next.disabled = self.page >= self.pages - 1
+
+    async def show(self, interaction):
+        self.update_buttons()
+        await interaction.response.edit_message(embed=role_users_embed(self.role, self.member_ids, self.page), view=self)
+
+    @discord.ui.button(label='Previous', style=discord.ButtonStyle.blurple, emoji='◀️')
+    async def previous(self, button: discord.ui.Button, interaction: discord.Interaction):
+        self.page = max(self.page - 1, 0)
+        await self.show(interaction)
+
+    @discord.ui.button(label='Next', style=discord.ButtonStyle.blurple, emoji='▶️')
+    async def next(self, button: discord.ui.Button, interaction: discord.Interaction):
+        self.page = min(self.page + 1, self.pages - 1)
+        await self.show(interaction)
+
 @bot.slash_command(name='roleusers', description='List all users with a role.', checks=[role_command])
 async def roleusers(interaction: discord.Interaction, role: Option(discord.Role, description='Role to get users from.', required=True)):
     if interaction.guild is None:
         return await interaction.response.send_message('**Error:** `This command cannot be used in private messages.`', ephemeral=True)
-    c.execute('SELECT role_id FROM manager_roles WHERE server_id=?', (interaction.guild.id,))
-    manager_role_id = c.fetchone()
+    manager_role_ids = (await db.get_config(interaction.guild.id)).manager
     if interaction.author.guild_permissions.administrator or interaction.author.id in owner:
         pass
-    elif manager_role_id:
-        manager_role = discord.utils.get(interaction.author.roles, id=manager_role_id[0])
+    elif manager_role_ids:
+        manager_role = discord.utils.find(lambda r: r.id in manager_role_ids, interaction.author.roles)
         if manager_role:
             pass
         else:
             return await interaction.response.send_message('**Error:** `You do not have permission to use this command.`', ephemeral=True)
     else:
         return await interaction.response.send_message('**Error:** `You do not have permission to use this command.`', ephemeral=True)
-    users = []
-    
-
-    for user in role.members:
-        users.append(f'- **{user.name}** *({user.id})*')
-    users = '\n'.join(users)
-    users = str(users).replace('[', '').replace(']', '').replace('(', '').replace(')', '').replace(',', '').replace("'", '')
-
-    # users format for file
-    userstxt = []
-
-    if len(users) > 1024:
-        userstxt = []
-        for user in role.members:
-            userstxt.append(f'- {user.name} ({user.id})')
-        userstxt = '\n'.join(userstxt)
-        userstxt = str(userstxt).replace('[', '').replace(']', '').replace('(', '').replace(')', '').replace(',', '').replace("'", '')
-        with open('users.txt', 'w') as f:
-            f.write('Users with the role: ' + role.name + '\n----------------------------------\n')
-            f.write(userstxt)
-        with open('users.txt', 'rb') as f:
-            embed = discord.Embed(title=f'Role Users | {role.name}', description=f'Role ID: {role.id}', color=role.color)
-            embed.add_field(name='Users', value=f'*Too many users to display. Sending in a text file.*', inline=False)
-            await interaction.response.send_message(embed=embed, file=discord.File(f, 'users.txt'), ephemeral=True)
-        os.remove('users.txt')
+    member_ids = role_member_snapshots.get(role)
+    embed = role_users_embed(role, member_ids, 0)
+    if len(member_ids) > ROLE_USERS_PAGE_SIZE:
+        await interaction.response.send_message(embed=embed, view=RoleUsersView(role, member_ids), ephemeral=True)
     else:
-        embed = discord.Embed(title=f'Role Users | {role.name}', description=f'Role ID: {role.id}', color=role.color)
-        embed.add_field(name='Users', value=f'{users}', inline=False)
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
@@ -1073,8 +1802,7 @@ async def roleusers(interaction: discord.Interaction, role: Option(discord.Role,
 async def rolehierarchy(interaction: discord.Interaction):
     if interaction.guild is None:
         return await interaction.response.send_message('**Error:** `This command cannot be used in private messages.`', ephemeral=True)
-    roles = interaction.guild.roles  # Get all roles in the server
-    roles.sort(key=lambda x: x.position, reverse=True)  # Sort roles by position in descending order
+    roles = role_positions.hierarchy(interaction.guild)  # roles by position in descending order
 
     roles_formatted = []
     rolestxt_formatted = []
@@ -1087,16 +1815,11 @@ async def rolehierarchy(interaction: discord.Interaction):
 
     # Check if the roles fit within a single message or need to be saved to a file
     if len(rolestxt_text) > 1024 or len(roles_text) > 1024:
-        with open('roles.txt', 'w') as f:
-            f.write(f'Roles in the server: {interaction.guild.name}\n----------------------------------\n')
-            f.write(rolestxt_text)
-
-        with open('roles.txt', 'rb') as f:
-            embed = discord.Embed(title=f'Role Hierarchy | {interaction.guild.name}', description=f'Server ID: {interaction.guild.id}', color=0x00ff00)
-            embed.add_field(name='Roles', value=f'*Too many roles to display. Sending in a text file.*', inline=False)
-            await interaction.response.send_message(embed=embed, file=discord.File(f, 'roles.txt'), ephemeral=True)
+        file = export_file('roles.txt', f'Roles in the server: {interaction.guild.name}\n----------------------------------\n' + rolestxt_text)
 
-        os.remove('roles.txt')
+        embed = discord.Embed(title=f'Role Hierarchy | {interaction.guild.name}', description=f'Server ID: {interaction.guild.id}', color=0x00ff00)
+        embed.add_field(name='Roles', value=f'*Too many roles to display. Sending in a text file.*', inline=False)
+        await interaction.response.send_message(embed=embed, file=file, ephemeral=True)
     else:
         embed = discord.Embed(title=f'Role Hierarchy | {interaction.guild.name}', description=f'Server ID: {interaction.guild.id}', color=0x00ff00)
         embed.add_field(name='Roles', value=roles_text, inline=False)
@@ -1112,12 +1835,7 @@ async def reset(interaction: discord.Interaction):
     else:
         if not interaction.author.guild_permissions.administrator:
             return await interaction.response.send_message('**Error:** `You do not have permission to use this command.`', ephemeral=True)
-    c.execute('DELETE FROM roles WHERE server_id=?', (interaction.guild.id,))
-    c.execute('DELETE FROM bypass WHERE server_id=?', (interaction.guild.id,))
-    c.execute('DELETE FROM auto WHERE server_id=?', (interaction.guild.id,))
-    c.execute('DELETE FROM manager_roles WHERE server_id=?', (interaction.guild.id,))
-    c.execute('DELETE FROM announcements WHERE server_id=?', (interaction.guild.id,))
-    conn.commit()
+    await db.reset_guild(interaction.guild.id)
     await interaction.response.send_message('Reset server data.', ephemeral=True)
 
     # support_server = bot.get_guild(1158967835616362626) # Role Control Support Server
@@ -1155,12 +1873,11 @@ async def temprole(
     ):
     if interaction.guild is None:
         return await interaction.response.send_message('**Error:** `This command cannot be used in private messages.`', ephemeral=True)
-    c.execute('SELECT role_id FROM manager_roles WHERE server_id=?', (interaction.guild.id,))
-    manager_role_id = c.fetchone()
+    manager_role_ids = (await db.get_config(interaction.guild.id)).manager
     if interaction.author.guild_permissions.administrator or interaction.author.id in owner:
         pass
-    elif manager_role_id:
-        manager_role = discord.utils.get(interaction.author.roles, id=manager_role_id[0])
+    elif manager_role_ids:
+        manager_role = discord.utils.find(lambda r: r.id in manager_role_ids, interaction.author.roles)
         if manager_role:
             pass
         else:
@@ -1190,23 +1907,24 @@ async def temprole(
         if total_minutes == 0:
             return await interaction.response.send_message('Invalid duration. Use `1w 1d 1h 1m 1s`.', ephemeral=True)
 
-        end_time = datetime.now() + timedelta(minutes=total_minutes)
+        expiry = int(time.time() + total_minutes * 60)
 
     if action == "remove":
+        # direct, the interaction has to be answered within 3 seconds whatever the queue holds
         await user.remove_roles(role)
         # delete from database
-        c.execute("DELETE FROM temp_roles WHERE server_id=? AND role_id=? AND user_id=?", (interaction.guild.id, role.id, user.id))
-        conn.commit()
+        await db.remove_temp_role(interaction.guild.id, role.id, user.id)
+        temp_role_scheduler.remove(interaction.guild.id, role.id, user.id)
         try:
-            await user.send(f'Your temporary role `{role.name}` in **{interaction.guild.name}** *(`{interaction.guild.id}`)* has been removed manully by **{interaction.author.name}** *(`{interaction.author.id}`)*.')
+            actions.post(NOTICES, interaction.guild.id, user.send, f'Your temporary role `{role.name}` in **{interaction.guild.name}** *(`{interaction.guild.id}`)* has been removed manully by **{interaction.author.name}** *(`{interaction.author.id}`)*.')
         except:
             pass
         return await interaction.response.send_message(f'Removed {role.mention} from {user.mention} manually.', ephemeral=True)
     elif action == "give":
         await user.add_roles(role)
         # add to database
-        c.execute("INSERT INTO temp_roles VALUES (?, ?, ?, ?)", (interaction.guild.id, role.id, user.id, end_time))
-        conn.commit()
+        await db.add_temp_role(interaction.guild.id, role.id, user.id, expiry)
+        temp_role_scheduler.add(interaction.guild.id, role.id, user.id, expiry)
         return await interaction.response.send_message(f'Gave {role.mention} to {user.mention} for `{duration}`.', ephemeral=True)
     else:
         return await interaction.response.send_message('Invalid action. Use `give` or `remove`.', ephemeral=True)
@@ -1228,12 +1946,13 @@ async def devhelp(ctx):
     embed.add_field(name='rc-announce_to <guild ids>', value='Send a announcement to specific servers.\nUse **[e:emoji_id]** to use a emoji.', inline=False)
     embed.add_field(name='rc-forcereset <guild id>', value='Force a server to reset it\'s setup.', inline=False)
     embed.add_field(name='rc-blacklist <add / remove> <guild id> [reason]', value='Blacklist a server and server owner.', inline=False)
-    embed.add_field(name='rc-listblacklist', value='List all blacklisted servers.', inline=False)
+    embed.add_field(name='rc-listblacklist [page]', value='List all blacklisted servers.', inline=False)
     embed.add_field(name='rc-dmpurge', value='Delete all messages in yours and the bot\'s DMs.', inline=False)
     embed.add_field(name='rc-getemojis <guild id>', value='Get all emojis in a server.', inline=False)
     embed.add_field(name='rc-embed <#channel> "<title>" "<description>" "<footer>" <colour>', value='Send a embed.', inline=False)
     embed.add_field(name='rc-showrawdata <guild id>', value='Show raw data for a server.', inline=False)
     embed.add_field(name='rc-showdb', value='Show the structure of the database.', inline=False)
+    embed.add_field(name='rc-memory', value='Show memory usage and cache sizes for the current intents profile.', inline=False)
     embed.add_field(name='rc-givechannelaccess <#channel> [guild id]', value='Gives you access to the mentioned channel.', inline=False)
     await ctx.reply(embed=embed)
 
@@ -1265,35 +1984,18 @@ async def givechannelaccess(ctx, channel: discord.TextChannel, guild_id: int=Non
 @bot.command()
 @commands.is_owner()
 async def showdb(ctx):
-    c.execute("PRAGMA table_info(roles)")
-    roles = c.fetchall()
-    c.execute("PRAGMA table_info(bypass)")
-    bypass = c.fetchall()
-    c.execute("PRAGMA table_info(auto)")
-    auto = c.fetchall()
-    c.execute("PRAGMA table_info(bot_role)")
-    bot_role = c.fetchall()
-    c.execute("PRAGMA table_info(announcements)")
-    announcements = c.fetchall()
-    c.execute("PRAGMA table_info(manager_roles)")
-    manager_roles = c.fetchall()
-    c.execute("PRAGMA table_info(temp_roles)")
-    temp_roles = c.fetchall()
-    c.execute("PRAGMA table_info(self_roles)")
-    self_roles = c.fetchall()
-    c.execute("PRAGMA table_info(self_role_templates)")
-    self_role_templates = c.fetchall()
-    
+    schema = await db.get_schema()
+
     embed = discord.Embed(title='Role Control | Database', description='Database structure.', color=0x00ff00)
-    embed.add_field(name='roles', value=f'{roles}', inline=False)
-    embed.add_field(name='bypass', value=f'{bypass}', inline=False)
-    embed.add_field(name='auto', value=f'{auto}', inline=False)
-    embed.add_field(name='bot_role', value=f'{bot_role}', inline=False)
-    embed.add_field(name='announcements', value=f'{announcements}', inline=False)
-    embed.add_field(name='manager_roles', value=f'{manager_roles}', inline=False)
-    embed.add_field(name='temp_roles', value=f'{temp_roles}', inline=False)
-    embed.add_field(name='self_roles', value=f'{self_roles}', inline=False)
-    embed.add_field(name='self_role_templates', value=f'{self_role_templates}', inline=False)
+    embed.add_field(name='roles', value=f'{schema["roles"]}', inline=False)
+    embed.add_field(name='bypass', value=f'{schema["bypass"]}', inline=False)
+    embed.add_field(name='auto', value=f'{schema["auto"]}', inline=False)
+    embed.add_field(name='bot_role', value=f'{schema["bot_role"]}', inline=False)
+    embed.add_field(name='announcements', value=f'{schema["announcements"]}', inline=False)
+    embed.add_field(name='manager_roles', value=f'{schema["manager_roles"]}', inline=False)
+    embed.add_field(name='temp_roles', value=f'{schema["temp_roles"]}', inline=False)
+    embed.add_field(name='self_roles', value=f'{schema["self_roles"]}', inline=False)
+    embed.add_field(name='self_role_templates', value=f'{schema["self_role_templates"]}', inline=False)
     await ctx.reply(embed=embed)
 
 #* Show Raw Data Command
@@ -1315,30 +2017,22 @@ async def showrawdata(ctx, guild_id: int):
     embed.add_field(name='Verification Level', value=f'{guild.verification_level}', inline=False)
     embed.add_field(name='Boosts', value=f'{guild.premium_subscription_count}', inline=False)
     embed.add_field(name='Boost Level', value=f'{guild.premium_tier}', inline=False)
-    embed.add_field(name='Emojis', value=f'{len(guild.emojis)}', inline=False)
+    embed.add_field(name='Emojis', value=f'{len(await get_guild_emojis(guild))}', inline=False)
 
     # create file with raw database data
-    c.execute('SELECT * FROM roles WHERE server_id=?', (guild.id,))
-    roles = c.fetchall()
-    c.execute('SELECT * FROM bypass WHERE server_id=?', (guild.id,))
-    bypass = c.fetchall()
-    c.execute('SELECT * FROM auto WHERE server_id=?', (guild.id,))
-    auto = c.fetchall()
-    c.execute('SELECT * FROM bot_role WHERE server_id=?', (guild.id,))
-    bot_role = c.fetchall()
-    c.execute('SELECT * FROM announcements WHERE server_id=?', (guild.id,))
-    announcements = c.fetchall()
-    c.execute('SELECT * FROM manager_roles WHERE server_id=?', (guild.id,))
-    manager_roles = c.fetchall()
-    c.execute('SELECT * FROM temp_roles WHERE server_id=?', (guild.id,))
-    temp_roles = c.fetchall()
-    c.execute('SELECT * FROM self_roles WHERE server_id=?', (guild.id,))
-    self_roles = c.fetchall()
-    c.execute('SELECT * FROM self_role_templates WHERE server_id=?', (guild.id,))
-    self_role_templates = c.fetchall()
+    raw_data = await db.get_raw_data(guild.id)
+    roles = raw_data['roles']
+    bypass = raw_data['bypass']
+    auto = raw_data['auto']
+    bot_role = raw_data['bot_role']
+    announcements = raw_data['announcements']
+    manager_roles = raw_data['manager_roles']
+    temp_roles = raw_data['temp_roles']
+    self_roles = raw_data['self_roles']
+    self_role_templates = raw_data['self_role_templates']
     
     # create formatted file
-    with open('raw_data.txt', 'w') as f:
+    with io.StringIO() as f:
         f.write('Raw Data for the server: ' + guild.name + '\n----------------------------------\n')
         f.write('Roles the bot prevents users from having:\n')
         for role in roles:
@@ -1365,11 +2059,10 @@ async def showrawdata(ctx, guild_id: int):
             f.write(f'{channel[1]}\n')
         
         f.write('\nTemp roles:\n')
-        for role in temp_roles:
-            for user_id, role_id, minutes in temp_roles:
-                user = bot.get_user(user_id)
-                role = bot.get_guild(guild.id).get_role(role_id)
-                f.write(f'{user} ({user_id}) has role {role} ({role_id}) for {minutes} minutes\n')
+        for server_id, role_id, user_id, expiry in temp_roles:
+            user = bot.get_user(user_id)
+            role = guild.get_role(role_id)
+            f.write(f'{user} ({user_id}) has role {role} ({role_id}) until {datetime.utcfromtimestamp(expiry or 0):%d/%m/%Y %H:%M} UTC\n')
         
         f.write('\nSelf roles:\n')
         for row in self_roles:
@@ -1395,13 +2088,9 @@ async def showrawdata(ctx, guild_id: int):
         f.write('Not yet implemented.\n')
         #for role in self_role_templates:
         #    f.write(f'{role[1]}\n')
+        file = export_file('raw_data.txt', f.getvalue())
 
-    with open('raw_data.txt', 'rb') as f:
-        await ctx.reply(embed=embed, file=discord.File(f, 'raw_data.txt'))
-    try:
-        os.remove('raw_data.txt')
-    except:
-        pass
+    await ctx.reply(embed=embed, file=file)
 
 #* Embed Command
 @bot.command()
@@ -1436,10 +2125,10 @@ async def embed(ctx, channel: discord.TextChannel, title: str, description: str,
         except:
             return await ctx.reply('**Error:** `Invalid role.`')
         await ctx.reply(f'Mentioning **{role.name}** *({role.id})*.')
-        await channel.send(role.mention, embed=embed)
+        await actions.enqueue(ANNOUNCEMENTS, channel.guild.id, channel.send, role.mention, embed=embed)
     elif reply.content.lower() == 'no':
         await ctx.reply('Not mentioning a role. Sending embed.')
-        await channel.send(embed=embed)
+        await actions.enqueue(ANNOUNCEMENTS, channel.guild.id, channel.send, embed=embed)
     await ctx.reply(f'Sent embed to {channel.mention}.')
 
 #* Get Emojis Command
@@ -1451,19 +2140,15 @@ async def getemojis(ctx, guild_id: int):
     except:
         return await ctx.reply('That server does not exist or I am not in that server.')
     emojis = []
-    for emoji in guild.emojis:
+    for emoji in await get_guild_emojis(guild):
         emojis.append(f'<:{emoji.name}:{emoji.id}>')
     emojis = '\n'.join(emojis)
     emojis = str(emojis).replace('[', '').replace(']', '').replace('(', '').replace(')', '').replace(',', '').replace("'", '')
     if len(emojis) > 1024:
-        with open('emojis.txt', 'w') as f:
-            f.write('Emojis for the server: ' + guild.name + '\n----------------------------------\n')
-            f.write(emojis)
-        with open('emojis.txt', 'rb') as f:
-            embed = discord.Embed(title=f'Emojis | {guild.name}', description=f'Emojis for {guild.name}', color=0x00ff00)
-            embed.add_field(name='Emojis', value=f'*Too many emojis to display.*', inline=False)
-            await ctx.reply(embed=embed, file=discord.File(f, 'emojis.txt'))
-        os.remove('emojis.txt')
+        file = export_file('emojis.txt', 'Emojis for the server: ' + guild.name + '\n----------------------------------\n' + emojis)
+        embed = discord.Embed(title=f'Emojis | {guild.name}', description=f'Emojis for {guild.name}', color=0x00ff00)
+        embed.add_field(name='Emojis', value=f'*Too many emojis to display.*', inline=False)
+        await ctx.reply(embed=embed, file=file)
     else:
         embed = discord.Embed(title=f'Emojis | {guild.name}', description=f'Emojis for {guild.name}', color=0x00ff00)
         embed.add_field(name='Emojis', value=f'{emojis}', inline=False)
@@ -1488,25 +2173,39 @@ async def serverinfo(ctx, guild_id: int):
     embed.add_field(name='Verification Level', value=f'{guild.verification_level}', inline=False)
     embed.add_field(name='Boosts', value=f'{guild.premium_subscription_count}', inline=False)
     embed.add_field(name='Boost Level', value=f'{guild.premium_tier}', inline=False)
-    embed.add_field(name='Emojis', value=f'{len(guild.emojis)}', inline=False)
+    embed.add_field(name='Emojis', value=f'{len(await get_guild_emojis(guild))}', inline=False)
+    await ctx.reply(embed=embed)
+
+#* Memory Command
+def memory_usage():
+    # resident set size in MB, only available on linux
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except:
+        return None
+
+@bot.command()
+@commands.is_owner()
+async def memory(ctx):
+    rss = memory_usage()
+    embed = discord.Embed(title='Memory', description=f'Profile: `{BOT_PROFILE}`', color=0x00ff00)
+    embed.add_field(name='RSS', value=f'{rss:.1f} MB' if rss is not None else 'Unknown', inline=False)
+    embed.add_field(name='Intents', value=', '.join(name for name, enabled in bot.intents if enabled), inline=False)
+    embed.add_field(name='Guilds', value=f'{len(bot.guilds)}', inline=False)
+    embed.add_field(name='Cached Members', value=f'{sum(len(guild.members) for guild in bot.guilds)}', inline=False)
+    embed.add_field(name='Cached Users', value=f'{len(bot.users)}', inline=False)
+    embed.add_field(name='Cached Messages', value=f'{len(bot.cached_messages)}', inline=False)
+    embed.add_field(name='Cached Emojis', value=f'{len(bot.emojis)}', inline=False)
     await ctx.reply(embed=embed)
 
 #* Dev Show Setup Command
 @bot.command()
 @commands.is_owner()
 async def devshowsetup(ctx, guild_id: int):
-    c.execute('SELECT role_id FROM manager_roles WHERE server_id=?', (guild_id,))
-    manager_roles = c.fetchone()
-    c.execute('SELECT role_id FROM roles WHERE server_id=?', (guild_id,))
-    roles = c.fetchall()
-    c.execute('SELECT role_id FROM auto WHERE server_id=?', (guild_id,))
-    auto_roles = c.fetchall()
-    c.execute('SELECT role_id FROM bypass WHERE server_id=?', (guild_id,))
-    bypass_roles = c.fetchall()
-    c.execute('SELECT role_id FROM manager_roles WHERE server_id=?', (guild_id,))
-    managers = c.fetchall()
-    c.execute('SELECT channel_id FROM announcements WHERE server_id=?', (guild_id,))
-    channel_id = c.fetchone()
+    config = await db.get_config(guild_id)
+    roles, auto_roles, bypass_roles, managers = config.protected, config.auto, config.bypass, config.manager
+    channel_id = config.channel
     if channel_id is None:
         return await ctx.reply('This server has not setup the bot!')
     await ctx.reply('Getting roles from database...')
@@ -1530,11 +2229,11 @@ async def devshowsetup(ctx, guild_id: int):
     if len(managers) == 0 or managers == '0':
         embed.add_field(name='Manager Roles', value='0 Roles Set', inline=False)
     else:
-        embed.add_field(name='Manager Roles', value=f'{len(manager_roles)} Roles Set', inline=False)
+        embed.add_field(name='Manager Roles', value=f'{len(managers)} Roles Set', inline=False)
     if channel_id == None:
         embed.add_field(name='Announcement Channel', value='Not set!?', inline=False)
     else:
-        embed.add_field(name='Announcement Channel', value=f'**#{bot.get_channel(channel_id[0]).name}** *({channel_id[0]})*', inline=False)
+        embed.add_field(name='Announcement Channel', value=f'**#{bot.get_channel(channel_id).name}** *({channel_id})*', inline=False)
     await ctx.reply(embed=embed)
 
 
@@ -1551,7 +2250,7 @@ async def dmpurge(ctx):
             dm_channel = await ctx.author.create_dm()
         async for message in dm_channel.history(limit=None):
             if message.author == bot.user:
-                await message.delete()
+                await actions.enqueue(NOTICES, None, message.delete)
                 deleted_count += 1
         if deleted_count == 0:
             await ctx.send("No messages to delete.")
@@ -1571,13 +2270,9 @@ async def inviteme(ctx, guild_id: int):
     if guild not in bot.guilds:
         return await ctx.reply('I am not in that server.')
     # create invite link that doesn't expire and can only be used once
+    channel = next((channel for channel in guild.text_channels if channel.permissions_for(guild.me).create_instant_invite), None)
     try:
-        for channel in guild.text_channels:
-            try:
-                invite = await channel.create_invite(max_uses=1, max_age=3600, reason=f'Invite requested by bot developer {ctx.author.name} *({ctx.author.id})*')
-                break
-            except:
-                pass
+        invite = await channel.create_invite(max_uses=1, max_age=3600, reason=f'Invite requested by bot developer {ctx.author.name} *({ctx.author.id})*')
     except:
         return await ctx.reply('I failed to create a invite link for that server.')
     await ctx.reply(f'Invite link for {guild.name}: {invite}')
@@ -1607,9 +2302,131 @@ async def leave(ctx, guild_id: int):
     # check if the bot is in the server
     if guild not in bot.guilds:
         return await ctx.reply('I am not in that server.')
-    await guild.leave()
+    await actions.enqueue(NOTICES, guild.id, guild.leave)
     await ctx.reply(f'Left {guild.name}.')
 
+#* Announcement broadcasts
+BROADCAST_CONCURRENCY = actions.capacity(ANNOUNCEMENTS) # servers sent to at the same time, one per worker that can post
+BROADCAST_PROGRESS_INTERVAL = 10 # seconds between progress edits and saves
+
+running_broadcasts = set()
+
+async def deliver_announcement(guild, channel_id, embed):
+    # announcement channel, then any channel that works, then tell the owner
+    if guild is None:
+        return 'failed'
+    channel = guild.get_channel(channel_id) if channel_id else None
+    if channel is not None and channel_resolver.can_send(channel):
+        try:
+            await actions.enqueue(ANNOUNCEMENTS, guild.id, channel.send, embed=embed)
+            return 'delivered'
+        except:
+            pass
+    channel = channel_resolver.resolve(guild)
+    if channel is not None:
+        try:
+            await actions.enqueue(ANNOUNCEMENTS, guild.id, channel.send, f'{guild.owner.mention}\nIf you would like to set a channel for announcements, use </setchannel:1145275940008636482>.', embed=embed)
+            return 'fallback'
+        except:
+            pass
+    try:
+        await actions.enqueue(NOTICES, guild.id, guild.owner.send, f'**NOTICE:** I failed to send the announcement to the server **{guild.name}** *({guild.id})*\nPlease make sure I have the permission `Administrator` and that there is at least one text channel.', embed=embed)
+    except:
+        pass
+    return 'failed'
+
+def broadcast_embed(broadcast_id, counts, finished=False):
+    embed = discord.Embed(title='Role Control | Announcement', description=f'Broadcast #{broadcast_id} {"finished" if finished else "in progress"}.', color=0x00ff00)
+    embed.add_field(name='Delivered', value=counts.get('delivered', 0))
+    embed.add_field(name='Fell back', value=counts.get('fallback', 0))
+    embed.add_field(name='Failed', value=counts.get('failed', 0))
+    if not finished:
+        embed.add_field(name='Pending', value=counts.get('pending', 0))
+    return embed
+
+async def start_broadcast(ctx, embed, guild_ids):
+    broadcast_id = await db.create_broadcast(json.dumps(embed.to_dict()), guild_ids)
+    message = await ctx.reply(embed=broadcast_embed(broadcast_id, {'pending': len(set(guild_ids))}))
+    await db.set_broadcast_message(broadcast_id, message.channel.id, message.id)
+    run_in_background(run_broadcast(broadcast_id))
+
+async def resume_broadcasts():
+    for broadcast_id in await db.get_unfinished_broadcasts():
+        logger.info(f'Resuming broadcast #{broadcast_id}')
+        run_in_background(run_broadcast(broadcast_id))
+
+async def run_broadcast(broadcast_id):
+    if broadcast_id in running_broadcasts:
+        return
+    running_broadcasts.add(broadcast_id)
+    try:
+        embed_data, channel_id, message_id = await db.get_broadcast(broadcast_id)
+        embed = discord.Embed.from_dict(json.loads(embed_data))
+        progress = None
+        if message_id is not None:
+            try:
+                channel = bot.get_channel(channel_id) or await bot.fetch_channel(channel_id)
+                progress = channel.get_partial_message(message_id)
+            except:
+                logger.warning(f'Failed to find the progress message of broadcast #{broadcast_id}')
+
+        pending = collections.deque(await db.get_deliveries(broadcast_id, 'pending'))
+        channels = await db.get_announcement_channels()
+        counts = collections.Counter(await db.get_delivery_counts(broadcast_id))
+        unsaved = {}
+
+        async def save():
+            if unsaved:
+                statuses = dict(unsaved)
+                unsaved.clear()
+                await db.set_delivery_statuses(broadcast_id, statuses)
+
+        async def report(finished=False):
+            if progress is None:
+                return
+            try:
+                await actions.enqueue(ANNOUNCEMENTS, None, progress.edit, embed=broadcast_embed(broadcast_id, counts, finished))
+            except:
+                pass
+
+        async def worker():
+            while pending:
+                guild_id = pending.popleft()
+                status = await deliver_announcement(bot.get_guild(guild_id), channels.get(guild_id), embed)
+                unsaved[guild_id] = status
+                counts['pending'] -= 1
+                counts[status] += 1
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(BROADCAST_PROGRESS_INTERVAL)
+                await save()
+                await report()
+
+        reporting = asyncio.ensure_future(reporter())
+        try:
+            await asyncio.gather(*[worker() for _ in range(BROADCAST_CONCURRENCY)])
+        finally:
+            reporting.cancel()
+            await save()
+        await db.finish_broadcast(broadcast_id)
+        logger.info(f'Broadcast #{broadcast_id} finished: {counts["delivered"]} delivered, {counts["fallback"]} fell back, {counts["failed"]} failed')
+
+        summary = broadcast_embed(broadcast_id, counts, finished=True)
+        for status, name in (('fallback', 'Fell back in'), ('failed', 'Failed in')):
+            guild_ids = await db.get_deliveries(broadcast_id, status)
+            if guild_ids:
+                summary.add_field(name=name, value=', '.join(map(str, guild_ids))[:1024], inline=False)
+        if progress is not None:
+            try:
+                await actions.enqueue(ANNOUNCEMENTS, None, progress.edit, embed=summary)
+            except:
+                pass
+    except Exception as e:
+        logger.error(f'Broadcast #{broadcast_id} stopped: {e}')
+    finally:
+        running_broadcasts.discard(broadcast_id)
+
 #* Announce Command
 @bot.command()
 @commands.is_owner()
@@ -1645,23 +2462,7 @@ async def announce(ctx):
                 embed.set_author(name=f'{ctx.author.name}', icon_url=f'{ctx.author.default_avatar.url}')
             embed.set_footer(text=f'This announcement has been sent to all servers the bot is in.')
 
-            for guild in bot.guilds:
-                try:
-                    c.execute('SELECT channel_id FROM announcements WHERE server_id=?', (guild.id,))
-                    channel_id = c.fetchone()[0]
-                    channel = bot.get_channel(channel_id)
-                    await channel.send(embed=embed)
-                except:
-                    try:
-                        for channel in guild.text_channels:
-                            try:
-                                await channel.send(f'{guild.owner.mention}\nIf you would like to set a channel for announcements, use </setchannel:1145275940008636482>.')
-                                break
-                            except:
-                                continue
-                    except:
-                        await guild.owner.send(f'**NOTICE:** I failed to send the announcement to the server **{guild.name}** *({guild.id})*\nPlease make sure I have the permission `Administrator` and that there is at least one text channel.', embed=embed)
-            await ctx.reply('Announcement sent to all servers.')
+            await start_broadcast(ctx, embed, [guild.id for guild in bot.guilds])
 
 #* Announce to Command (Announce to a specific server(s))
 @bot.command()
@@ -1700,24 +2501,7 @@ async def announce_to(ctx, guilds: commands.Greedy[int]):
                 embed.set_author(name=f'{ctx.author.name}', icon_url=f'{ctx.author.default_avatar.url}')
             embed.set_footer(text=f'This announcement has been sent to specific servers.')
 
-            for guild_id in guilds:
-                try:
-                    guild = bot.get_guild(guild_id)
-                    c.execute('SELECT channel_id FROM announcements WHERE server_id=?', (guild.id,))
-                    channel_id = c.fetchone()[0]
-                    channel = bot.get_channel(channel_id)
-                    await channel.send(embed=embed)
-                except:
-                    try:
-                        for channel in guild.text_channels:
-                            try:
-                                await channel.send(f'{guild.owner.mention}\nIf you would like to set a channel for announcements, use </setchannel:1145275940008636482>.')
-                                break
-                            except:
-                                continue
-                    except:
-                        await guild.owner.send(f'**NOTICE:** I failed to send the announcement to the server **{guild.name}** *({guild.id})*\nPlease make sure I have the permission `Administrator` and that there is at least one text channel.', embed=embed)
-            await ctx.reply(f'Announcement sent to {len(guilds)} servers.')
+            await start_broadcast(ctx, embed, guilds)
 
 #* Reset Command
 @bot.command()
@@ -1731,10 +2515,7 @@ async def forcereset(ctx, guild_id: int):
     # check if the bot is in the server
     if guild not in bot.guilds:
         return await ctx.reply('I am not in that server.')
-    c.execute('DELETE FROM roles WHERE server_id=?', (guild.id,))
-    c.execute('DELETE FROM bypass WHERE server_id=?', (guild.id,))
-    c.execute('DELETE FROM auto WHERE server_id=?', (guild.id,))
-    conn.commit()
+    await db.force_reset_guild(guild.id)
     await ctx.reply(f'Reset {guild.name}\'s data.')
 
     # support_server = bot.get_guild(1158967835616362626) # Role Control Support Server
@@ -1746,88 +2527,53 @@ async def forcereset(ctx, guild_id: int):
 #* Blacklist Command
 @bot.command()
 @commands.is_owner()
-async def blacklist(ctx, action, guild_id: str, *, reason=None):
-    with open('blacklist.json', 'r') as f:
-        blacklist = json.load(f)
+async def blacklist(ctx, action, guild_id: int, *, reason=None):
     if action.lower() == 'add':
         # check if server is already blacklisted
-        with open('blacklist.json', 'r') as f:
-            blacklist = json.load(f)
-        if str(guild_id) in blacklist['servers']:
+        if db.is_blacklisted(guild_id):
             return await ctx.reply('That server is already blacklisted.')
         if reason is None:
             reason = 'No reason given.'
         # add server to blacklist
-        blacklist['servers'].append(str(guild_id))
-        blacklist['reasons'][str(guild_id)] = reason
-        try:
-            guild = bot.get_guild(guild_id)
-            if guild:
-                blacklist['names'][str(guild_id)] = guild.name
-            else:
-                blacklist['names'][str(guild_id)] = 'Unknown Server'
-        except:
-            blacklist['names'][str(guild_id)] = 'Unknown Server'
-        with open('blacklist.json', 'w') as f:
-            json.dump(blacklist, f, indent=4)
+        guild = bot.get_guild(guild_id)
+        await db.add_blacklist(guild_id, guild.name if guild else 'Unknown Server', reason)
         await ctx.reply(f'Added server with ID {guild_id} to blacklist.')
 
-        # Notify server owner (whether bot is in the guild or not)
-        try:
-            guild = bot.get_guild(guild_id)
-            if guild:
-                owner = guild.owner
-                try:
-                    await owner.send('Your server has been blacklisted from using Role Control.\nIf you believe this is a mistake, please contact the developer *(652498200447549450)*.')
-                except:
-                    try:
-                        for channel in guild.text_channels:
-                            try:
-                                await channel.send(f'{guild.owner.mention} This server has been blacklisted from using Role Control.\nIf you believe this is a mistake, please contact the developer. *(652498200447549450)*')
-                                break
-                            except:
-                                continue
-                    except:
-                        pass
-
-            await guild.leave()
-        except:
-            pass
+        # Notify server owner and leave if the bot is in the server
+        if guild:
+            await leave_blacklisted(guild)
 
     elif action.lower() == 'remove':
         # check if server is already blacklisted
-        with open('blacklist.json', 'r') as f:
-            blacklist = json.load(f)
-        if str(guild_id) not in blacklist['servers']:
+        if not db.is_blacklisted(guild_id):
             return await ctx.reply('That server is not blacklisted.')
         # remove server from blacklist
-        blacklist['servers'].remove(str(guild_id))
-        del blacklist['reasons'][str(guild_id)]
-        del blacklist['names'][str(guild_id)]
-        with open('blacklist.json', 'w') as f:
-            json.dump(blacklist, f, indent=4)
+        await db.remove_blacklist(guild_id)
         await ctx.reply(f'Removed server with ID {guild_id} from blacklist.')
     
     else:
         await ctx.reply('Invalid action. Use `add` or `remove`.')
 
 #* List Blacklist Command
+BLACKLIST_PAGE_SIZE = 10
+# 10 fields of name + reason + date stay under discord's 6000 character limit for a whole embed
+BLACKLIST_NAME_LENGTH = 100 # discord's own limit for server names
+BLACKLIST_REASON_LENGTH = 400
+
 @bot.command()
 @commands.is_owner()
-async def listblacklist(ctx):
-    with open('blacklist.json', 'r') as f:
-        blacklist = json.load(f)
-    
-    servers = []
-    for guild_id in blacklist['servers']:
-        servers.append(f'- **{blacklist["names"][guild_id]}** *({guild_id})*\n> **Reason:** {blacklist["reasons"][guild_id]}')
-        
-    if not servers:
-        servers.append('No blacklisted servers.')
-    
-    servers_list = '\n'.join(servers)
-    embed = discord.Embed(title='Role Control | Blacklist', description='Discord Bot to control & manage roles.', color=0x00ff00)
-    embed.add_field(name='Servers', value=servers_list, inline=False)
+async def listblacklist(ctx, page: int = 1):
+    pages = max(1, -(-len(db.blacklist) // BLACKLIST_PAGE_SIZE))
+    page = min(max(page, 1), pages)
+    rows = await db.get_blacklist_page(page - 1, BLACKLIST_PAGE_SIZE)
+
+    embed = discord.Embed(title='Role Control | Blacklist', description=f'{len(db.blacklist)} blacklisted servers.' if rows else 'No blacklisted servers.', color=0x00ff00)
+    for guild_id, name, reason, added in rows:
+        reason = f'{reason}'
+        if len(reason) > BLACKLIST_REASON_LENGTH:
+            reason = reason[:BLACKLIST_REASON_LENGTH - 3] + '...'
+        embed.add_field(name=f'{name[:BLACKLIST_NAME_LENGTH]} ({guild_id})', value=f'**Reason:** {reason}\n**Added:** <t:{added}:d>', inline=False)
+    embed.set_footer(text=f'Page {page}/{pages} | rc-listblacklist <page>')
     await ctx.reply(embed=embed)
 
 ## ? Bot Events
@@ -1835,6 +2581,8 @@ async def listblacklist(ctx):
 #* When Bot Joins Server
 @bot.event
 async def on_guild_join(guild):
+    if db.is_blacklisted(guild.id):
+        return await leave_blacklisted(guild)
     await asyncio.sleep(2.5) # wait 2.5 seconds to make sure no errors occur
     embed = discord.Embed(title='Terms of Service', description='By adding this bot to your server, you agree to the following terms of service.', color=0x00ff00)
     embed.add_field(name='1.', value='You will not use this bot to break the [Discord TOS](https://discord.com/terms) or [Discord Guidelines](https://discord.com/guidelines).', inline=False)
@@ -1848,29 +2596,18 @@ async def on_guild_join(guild):
     promo.add_field(name='Skyline Hosting', value='Skyline Hosting is a hosting company that offers reasonable prices, excellent support, and constant uptime. They offer Minecraft Server, Discord Bot, Web Hosting, and more!', inline=False)
     promo.add_field(name='SkyNet', value='SkyNet is a newly created Minecraft Network in development.', inline=False)
     try:
-        for channel in guild.text_channels:
-            try:
-                await guild.owner.send(f'Thank you for inviting me to your server **{guild.name}**\nUse </setup:1146779160996483114> to setup the bot for your server.\nIf any issues occur, report them on **[our server](<https://discord.gg/9HtyP4SJVJ>)**.', embed=embed)
-                await guild.owner.send(embed=promo)
-                break # if sent successfully, break out of loop
-            except Exception as e:
-                logger.error(f"An error occured while sending join message to Guild Owner ({guild.owner.id}) of {guild.name} ({guild.id}): {e}")
-                
-                continue # if error, continue
-    except:
-        logger.warning(f"An error occured while sending join message to Guild Owner ({guild.owner.id}) of {guild.name} ({guild.id}). Sending to server instead.")
+        await actions.enqueue(NOTICES, guild.id, guild.owner.send, f'Thank you for inviting me to your server **{guild.name}**\nUse </setup:1146779160996483114> to setup the bot for your server.\nIf any issues occur, report them on **[our server](<https://discord.gg/9HtyP4SJVJ>)**.', embed=embed)
+        await actions.enqueue(NOTICES, guild.id, guild.owner.send, embed=promo)
+    except Exception as e:
+        logger.warning(f"An error occured while sending join message to Guild Owner ({guild.owner.id}) of {guild.name} ({guild.id}): {e}. Sending to server instead.")
+        channel = channel_resolver.resolve(guild)
         try:
-            await channel.send(f'Thank you for inviting me!\nUse </setup:1146779160996483114> to setup the bot for your server.\nIf any issues occur, report them on **[our server](<https://discord.gg/9HtyP4SJVJ>)**.', embed=embed)
-            await channel.send(embed=promo)
-        except:
-            logger.error(f"An error occured while sending join message to {channel.name} in {guild.name} ({guild.id}): {e}")
-    # get the bot's role
-    for role in guild.roles:
-        if role.name == 'Role Control':
-            bot_role = role
+            await actions.enqueue(NOTICES, guild.id, channel.send, f'Thank you for inviting me!\nUse </setup:1146779160996483114> to setup the bot for your server.\nIf any issues occur, report them on **[our server](<https://discord.gg/9HtyP4SJVJ>)**.', embed=embed)
+            await actions.enqueue(NOTICES, guild.id, channel.send, embed=promo)
+        except Exception as e:
+            logger.error(f"An error occured while sending join message to {channel} in {guild.name} ({guild.id}): {e}")
     # add bot role to database
-    c.execute('INSERT INTO bot_role VALUES (?, ?)', (guild.id, bot_role.id))
-    conn.commit()
+    await track_bot_role(guild)
 
     # support_server = bot.get_guild(1158967835616362626) # get the support server
     # log_channel = support_server.get_channel(1173867643707600897) # get the bot server logs channel
@@ -1889,101 +2626,135 @@ async def on_guild_join(guild):
 
 
 #* On Member Join
+# how many servers grant auto roles at the same time, one per worker that can run role changes
+AUTO_ROLE_CONCURRENCY = actions.capacity(ROLES)
+
+class AutoRoleQueue:
+    '''Per-server queue of joined members waiting for their auto roles.
+
+    Each server is drained by one task, so its members go out one request at a time in join order,
+    and at most AUTO_ROLE_CONCURRENCY servers drain at once.
+    '''
+
+    def __init__(self, concurrency=AUTO_ROLE_CONCURRENCY):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.queues = {} # guild id -> deque of members, present while the server is draining
+
+    def push(self, member):
+        queue = self.queues.get(member.guild.id)
+        if queue is None:
+            queue = self.queues[member.guild.id] = collections.deque()
+            run_in_background(self.drain(member.guild))
+        queue.append(member)
+
+    async def drain(self, guild):
+        queue = self.queues[guild.id]
+        try:
+            async with self.semaphore:
+                while queue:
+                    await self.grant(queue.popleft())
+        finally:
+            del self.queues[guild.id]
+
+    async def grant(self, member):
+        # read the auto roles when the member is processed, so setup changes during a burst apply
+        auto_roles = (await db.get_config(member.guild.id)).auto
+        roles = [role for role in map(member.guild.get_role, auto_roles) if role is not None and role not in member.roles]
+        if not roles or member.guild.get_member(member.id) is None:
+            return
+        # one PUT per role: a non-atomic add replaces the whole role list with the cached one, which would drop
+        # roles a verification bot gave the member moments after joining that the cache has not seen yet
+        try:
+            await actions.enqueue(ROLES, member.guild.id, member.add_roles, *roles, reason='Auto role', atomic=True)
+        except Exception as e:
+            logger.warning(f'Failed to give auto role(s) to {member} ({member.id}) in {member.guild.name} ({member.guild.id}): {e}')
+
+
+auto_role_queue = AutoRoleQueue()
+
 @bot.event
 async def on_member_join(member):
     # check if the user joined using a invite created by the bot
 
 
 
-    # get auto roles
-    c.execute('SELECT role_id FROM auto WHERE server_id=?', (member.guild.id,))
-    auto_roles = c.fetchall()
-
     # add auto roles
-    if len(auto_roles) == 0:
-        return
-    
-    for role in auto_roles:
-        if role[0] == 0:
-            return
-        await member.add_roles(member.guild.get_role(role[0]))
+    if (await db.get_config(member.guild.id)).auto:
+        auto_role_queue.push(member)
 
 #* On Member Update
 @bot.event
 async def on_member_update(before, after):
+    if after.id == bot.user.id:
+        channel_resolver.invalidate(after.guild.id)
+    # only role additions matter, skip nickname, avatar, pending and timeout updates
+    added_roles = {role.id for role in after.roles} - {role.id for role in before.roles}
+    if not added_roles:
+        return
+    config = await db.get_config(after.guild.id)
+    # check if any of the added roles are protected
+    roles = added_roles & config.protected
+    if not roles or after.bot:
+        return
     # check if user has bypass role
-    c.execute('SELECT role_id FROM bypass WHERE server_id=?', (after.guild.id,))
-    bypass_roles = c.fetchall()
-    # check if user has role(s)
-    for role in bypass_roles:
-        if after.guild.get_role(role[0]) in after.roles:
-            return
-    # check if user has role(s)
-    c.execute('SELECT role_id FROM roles WHERE server_id=?', (after.guild.id,))
-    roles = c.fetchall()
-    for role in roles:
-        if after.guild.get_role(role[0]) in after.roles:
-            if after.bot:
-                return
-            # get the person who gave the role via audit logs
-            async for log in after.guild.audit_logs(limit=1, action=discord.AuditLogAction.member_role_update):
-                if log.target.id == after.id:
-                    giver = log.user
-                    break
-            else:
-                giver = None
-            if giver:
-                # tell the giver that they gave the role
-                await giver.send(f'You gave the role `{after.guild.get_role(role[0])}` to `{after}` *({after.id})* in the server `{after.guild.name}` *({after.guild.id})*\nThis role is protected and has been removed!')
-            else:
-                await after.guild.owner.send(f'Role `{after.guild.get_role(role[0])}` was given to `{after}` *({after.id})* by an unknown user in the server `{after.guild.name}` *({after.guild.id})*\nThis role is protected and has been removed!')
-            try:
-                await after.remove_roles(after.guild.get_role(role[0]))
-            except:
-                await after.guild.owner.send(f'Failed to remove role `{after.guild.get_role(role[0])}` from `{after}` *({after.id})* in the server `{after.guild.name}` *({after.guild.id})*\nPlease make sure I have the permission `Manage Roles` and that my role is above the role!')
+    if any(role.id in config.bypass for role in after.roles):
+        return
+    protected = [role for role in map(after.guild.get_role, roles) if role is not None]
+    if not protected:
+        return
+    # remove every protected role in one request (atomic removal sends one request per role). The role list
+    # is read from the cache when the job runs, and a server runs one enforcement job at a time, so two strips
+    # never build their lists from the same stale state
+    try:
+        await actions.enqueue(ENFORCEMENT, after.guild.id, after.remove_roles, *protected, reason='Protected role', atomic=len(protected) == 1)
+    except:
+        role_names = ', '.join(f'`{role}`' for role in protected)
+        return notifier.send(after.guild.id, after.guild.owner, f'Failed to remove role(s) {role_names} from `{after}` *({after.id})* in the server `{after.guild.name}` *({after.guild.id})*\nPlease make sure I have the permission `Manage Roles` and that my role is above the role!')
+    # get the people who gave the roles from the audit log events
+    givers = await asyncio.gather(*[role_givers.wait_for(after.guild.id, after.id, role.id) for role in protected])
+    # one notice per giver
+    given_by = {}
+    for role, giver in zip(protected, givers):
+        given_by.setdefault(giver, []).append(role)
+    for giver, given_roles in given_by.items():
+        role_names = ', '.join(f'`{role}`' for role in given_roles)
+        removed = 'This role is protected and has been removed!' if len(given_roles) == 1 else 'These roles are protected and have been removed!'
+        if giver:
+            # tell the giver that they gave the role
+            notifier.send(after.guild.id, giver, f'You gave the role(s) {role_names} to `{after}` *({after.id})* in the server `{after.guild.name}` *({after.guild.id})*\n{removed}')
+        else:
+            notifier.send(after.guild.id, after.guild.owner, f'Role(s) {role_names} given to `{after}` *({after.id})* by an unknown user in the server `{after.guild.name}` *({after.guild.id})*\n{removed}')
+
+#* On Audit Log Entry (records who gave roles for on_member_update)
+@bot.event
+async def on_audit_log_entry(entry):
+    if entry.action != discord.AuditLogAction.member_role_update or entry.user is None or entry.target is None:
+        return
+    for role in getattr(entry.changes.after, 'roles', None) or []:
+        role_givers.record(entry.guild.id, entry.target.id, role.id, entry.user)
 
 #* On Role Delete
 @bot.event
 async def on_guild_role_delete(role):
+    channel_resolver.invalidate(role.guild.id)
+    role_positions.remove(role)
     await asyncio.sleep(1.5)
     if role.guild not in bot.guilds:
         return
     
     type = 'Unknown'
 
-    c.execute('SELECT role_id FROM roles WHERE role_id=?', (role.id,))
-    if c.fetchone() is not None:
-        type = 'Protected'
-        await role.guild.owner.send(f'Role `{role}` was deleted. I have removed it from my database.')
-        # remove role from database
-        c.execute('DELETE FROM roles WHERE role_id=?', (role.id,))
-
-    c.execute('SELECT role_id FROM bypass WHERE role_id=?', (role.id,))
-    if c.fetchone() is not None:
-        type = 'Bypass'
-        await role.guild.owner.send(f'Role `{role}` was deleted. I have removed it from my database.')
-        # remove role from database
-        c.execute('DELETE FROM bypass WHERE role_id=?', (role.id,))
-
-    c.execute('SELECT role_id FROM auto WHERE role_id=?', (role.id,))
-    if c.fetchone() is not None:
-        type = 'Auto'
-        await role.guild.owner.send(f'Role `{role}` was deleted. I have removed it from my database.')
-        # remove role from database
-        c.execute('DELETE FROM auto WHERE role_id=?', (role.id,))
-
-    c.execute('SELECT role_id FROM manager_roles WHERE role_id=?', (role.id,))
-    if c.fetchone() is not None:
-        type = 'Manager'
-        await role.guild.owner.send(f'Role `{role}` was deleted. I have removed it from my database.')
+    config = await db.get_config(role.guild.id)
+    kinds = [kind for kind in ROLE_TABLES if role.id in config.roles(kind)]
+    if kinds:
+        type = kinds[-1].capitalize()
+        notifier.send(role.guild.id, role.guild.owner, f'Role `{role}` was deleted. I have removed it from my database.')
         # remove role from database
-        c.execute('DELETE FROM manager_roles WHERE role_id=?', (role.id,))
+        await db.remove_roles(kinds, role.guild.id, role.id)
 
-    c.execute('SELECT role_id FROM self_roles WHERE role_id=?', (role.id,))
-    if c.fetchone() is not None:
+    if await db.is_self_role(role.id):
         type = 'Self-Role'
-        await role.guild.owner.send(f'Self-Role `{role}` was deleted.\nI cannot remove it from my database as it is a self-role. Please remove or replace it manually.')
-    conn.commit()
+        notifier.send(role.guild.id, role.guild.owner, f'Self-Role `{role}` was deleted.\nI cannot remove it from my database as it is a self-role. Please remove or replace it manually.')
 
     if type == 'Self-Role' or type == 'Unknown':
         return
@@ -1998,16 +2769,11 @@ async def on_guild_role_delete(role):
 @bot.event
 async def on_guild_remove(guild):
     # delete server from all databases
-    c.execute('DELETE FROM roles WHERE server_id=?', (guild.id,))
-    c.execute('DELETE FROM bypass WHERE server_id=?', (guild.id,))
-    c.execute('DELETE FROM auto WHERE server_id=?', (guild.id,))
-    c.execute('DELETE FROM bot_role WHERE server_id=?', (guild.id,))
-    c.execute('DELETE FROM announcements WHERE server_id=?', (guild.id,))
-    c.execute('DELETE FROM manager_roles WHERE server_id=?', (guild.id,))
-    c.execute('DELETE FROM self_roles WHERE server_id=?', (guild.id,))
-    c.execute('DELETE FROM temp_roles WHERE server_id=?', (guild.id,))
-    c.execute('DELETE FROM self_role_templates WHERE server_id=?', (guild.id,))
-    conn.commit()
+    await db.purge_guild(guild.id)
+    role_givers.forget_guild(guild.id)
+    temp_role_scheduler.forget_guild(guild.id)
+    channel_resolver.invalidate(guild.id)
+    role_positions.forget_guild(guild.id)
 
     # support_server = bot.get_guild(1158967835616362626) # get the support server
     # log_channel = support_server.get_channel(1173867643707600897) # get the bot server logs channel
@@ -2015,230 +2781,332 @@ async def on_guild_remove(guild):
     # embed.set_footer(text=f'Bot is now in {len(bot.guilds)} servers.')
     # await log_channel.send(embed=embed)
 
+#* Bot role tracking
+async def track_bot_role(guild):
+    # the bot's managed role, resolved by discord instead of searching roles by name
+    if guild.self_role is not None:
+        await db.set_bot_role(guild.id, guild.self_role.id)
+    else:
+        logger.warning(f'Failed to find the bot\'s role in {guild.name} ({guild.id})')
+
+#* On shard ready
+@bot.event
+async def on_shard_ready(shard_id):
+    # background loops start as soon as their own shard has its servers, not when every shard is ready
+    start_shard_loops(shard_id)
+
+# Servers coming back after an outage, servers available at startup are handled in on_ready
+@bot.event
+async def on_guild_available(guild):
+    # role events may have been missed while the server was unavailable
+    role_positions.forget_guild(guild.id)
+    if bot.is_ready():
+        await track_bot_role(guild)
+
+@bot.event
+async def on_guild_role_create(role):
+    channel_resolver.invalidate(role.guild.id)
+    role_positions.add(role)
+    if role.is_bot_managed() and role.tags.bot_id == bot.user.id:
+        await db.set_bot_role(role.guild.id, role.id)
+
 # When the bot's personal role is updated (Administrator Permissions removed)
 @bot.event
 async def on_guild_role_update(before, after):
-    # get the bot's role from the database
-    c.execute('SELECT role_id FROM bot_role WHERE server_id=?', (after.guild.id,))
-    bot_role = c.fetchone()
-
+    channel_resolver.invalidate(after.guild.id)
+    role_positions.update(before, after)
     # check if the role is the bot's role
-    if bot_role is not None:
-        if after.id == bot_role[0]:
-            if before.permissions.administrator and not after.permissions.administrator:
-                message = 'I have detected that my **Administrator Permissions** have been removed. ' \
-                            'Please give me **Administrator Permissions** to ensure I work correctly.' \
-                            '\n\nIf you do not want to give me **Administrator Permissions**, please give me the following permissions:\n' \
-                            '> `Send Messages` : I need this permission to send messages.\n' \
-                            '> `Manage Roles` : I need this permission to manage roles as that is my purpose.\n' \
-                            '> `View Audit Log` : I need this permission to retrieve the person who gave a protected role.\n' \
-                            '> `Create Invite` : I need this permission to invite the developer if deemed necessary.\n' \
-                            '> `Embed Links` : I need this permission to send embeds.\n' \
-                            '> `Add Reactions` : I need this permission to add reactions to messages.\n' \
-                            '> `Use External Emojis` : I need this permission to use emojis from my server.\n' \
-
-                # send message to guild owner
-                try:
-                    await after.guild.owner.send(message)
-                except:
-                    try:
-                        for channel in after.guild.text_channels:
-                            try:
-                                await channel.send(f'{after.guild.owner.mention},\n {message}')
-                                break
-                            except:
-                                continue
-                    except:
-                        pass
-    else:
-        # find a role the bot manages
-        for role in after.guild.roles:
-            if role.managed and role.name == 'Role Control':
-                # add bot role to database
-                c.execute('INSERT INTO bot_role VALUES (?, ?)', (after.guild.id, role.id))
-                conn.commit()
-                break
-            else:
-                logger.error(f'Failed to find the bot\'s role in {after.guild.name} ({after.guild.id})')
-                break
+    if not (after.is_bot_managed() and after.tags.bot_id == bot.user.id):
+        return
+    await db.set_bot_role(after.guild.id, after.id)
+
+    if before.permissions.administrator and not after.permissions.administrator:
+        message = 'I have detected that my **Administrator Permissions** have been removed. ' \
+                    'Please give me **Administrator Permissions** to ensure I work correctly.' \
+                    '\n\nIf you do not want to give me **Administrator Permissions**, please give me the following permissions:\n' \
+                    '> `Send Messages` : I need this permission to send messages.\n' \
+                    '> `Manage Roles` : I need this permission to manage roles as that is my purpose.\n' \
+                    '> `View Audit Log` : I need this permission to retrieve the person who gave a protected role.\n' \
+                    '> `Create Invite` : I need this permission to invite the developer if deemed necessary.\n' \
+                    '> `Embed Links` : I need this permission to send embeds.\n' \
+                    '> `Add Reactions` : I need this permission to add reactions to messages.\n' \
+                    '> `Use External Emojis` : I need this permission to use emojis from my server.\n' \
+
+        # send message to guild owner
+        notifier.send(after.guild.id, after.guild.owner, message, fallback=after.guild)
+
+@bot.event
+async def on_guild_channel_create(channel):
+    channel_resolver.invalidate(channel.guild.id)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    channel_resolver.invalidate(after.guild.id)
+
+@bot.event
+async def on_guild_update(before, after):
+    # the system channel may have changed
+    channel_resolver.invalidate(after.id)
 
 @bot.event
 async def on_guild_channel_delete(channel):
-    c.execute('SELECT channel_id FROM announcements WHERE server_id=?', (channel.guild.id,))
-    channel_id = c.fetchone()
+    channel_resolver.invalidate(channel.guild.id)
+    channel_id = await db.get_announcement_channel(channel.guild.id)
 
-    if channel_id is not None and channel_id[0] == channel.id:
+    if channel_id is not None and channel_id == channel.id:
         logger.info(f'Announcement Channel Deleted: {channel.name} ({channel.id}) in {channel.guild.name} ({channel.guild.id})')
 
         guild_owner = channel.guild.owner
 
         embed = discord.Embed(title='Role Control | Announcement Channel Deleted', description='Discord Bot to control & manage roles.', color=0x00ff00)
-        embed.add_field(name='Announcement Channel ID', value=channel_id[0], inline=False)
+        embed.add_field(name='Announcement Channel ID', value=channel_id, inline=False)
 
         # support_server = bot.get_guild(1158967835616362626) # get the support server
         # log_channel = support_server.get_channel(1173865122528239698)
 
         # await log_channel.send(embed=embed)
 
-        try:
-            await guild_owner.send(f'{guild_owner.mention}, you have deleted the announcement channel for {bot.user.mention} in your server **{channel.guild.name}** *(`{channel.guild.id}`)*.\nUse </setchannel:1145275940008636482> to set a new announcement channel.', embed=embed)
-        except:
-            try:
-                for channel in channel.guild.text_channels:
-                    try:
-                        await channel.send(f'{guild_owner.mention}, you have deleted the announcement channel for {bot.user.mention} in your server **{channel.guild.name}** *(`{channel.guild.id}`)*.\nUse </setchannel:1145275940008636482> to set a new announcement channel.', embed=embed)
-                        break
-                    except:
-                        continue
-            except Exception as e:
-                logger.error(f'Failed to send announcement channel deleted message to guild owner of {channel.guild.name} ({channel.guild.id}): {e}')
-                pass
+        notifier.send(channel.guild.id, guild_owner, f'{guild_owner.mention}, you have deleted the announcement channel for {bot.user.mention} in your server **{channel.guild.name}** *(`{channel.guild.id}`)*.\nUse </setchannel:1145275940008636482> to set a new announcement channel.', embed=embed, fallback=channel.guild)
 
-        c.execute('DELETE FROM announcements WHERE server_id=?', (channel.guild.id,))
-        conn.commit()
+        await db.remove_announcement_channel(channel.guild.id)
 
 
 ## ? Loops
 
+#* Shard helpers
+def shard_for(guild_id):
+    return (guild_id >> 22) % (bot.shard_count or 1)
+
+def shard_guilds(shard_id):
+    return [guild for guild in bot.guilds if guild.shard_id == shard_id]
+
 #* Setup reminder
-async def setup_reminder():
-    await bot.wait_until_ready()
+REMINDER_INTERVAL = 86400 # remind each unconfigured server once a day
+REMINDER_JITTER = 3600 # +/- seconds added to each reminder so they stay spread out
+REMINDER_TICK = 600 # how often due reminders are checked
+
+async def setup_reminder(shard_id):
+    reminder_times = {guild_id: next_reminder_at for guild_id, next_reminder_at in (await db.get_reminder_times()).items() if shard_for(guild_id) == shard_id}
     while not bot.is_closed():
-        for guild in bot.guilds:
-            c.execute('SELECT role_id FROM roles WHERE server_id=?', (guild.id,))
-            roles = c.fetchall()
-            c.execute('SELECT role_id FROM auto WHERE server_id=?', (guild.id,))
-            auto_roles = c.fetchall()
-            c.execute('SELECT role_id FROM bypass WHERE server_id=?', (guild.id,))
-            bypass_roles = c.fetchall()
-            c.execute('SELECT channel_id FROM announcements WHERE server_id=?', (guild.id,))
-            channel_id = c.fetchone()
-            if channel_id is None:
-                try:
-                    await guild.owner.send(f'You have not setup the bot for your server ({guild.name} *({guild.id})*). Use </setup:1146779160996483114> to setup the bot for your server.')
-                    logger.info(f'Sent setup reminder to {guild.owner.name} ({guild.owner.id}) of {guild.name} ({guild.id})')
-
-                    embed = discord.Embed(title='Role Control | Setup Reminder', description=f'Setup Reminder for server **{guild.name}** *(`{guild.id}`)*', color=0x00ff00)
-                    embed.add_field(name='Owner', value=f'{guild.owner.name} *({guild.owner.id})*', inline=False)
-                    embed.add_field(name='Members', value=f'Total: {guild.member_count}\nUsers: {len([member for member in guild.members if not member.bot])}\nBots: {len([member for member in guild.members if member.bot])}', inline=False)
-                    embed.add_field(name='Channels', value=f'{len(guild.channels)}', inline=False)
-                    embed.add_field(name='Roles', value=f'{len(guild.roles)}', inline=False)
-                    embed.add_field(name='Emojis', value=f'{len(guild.emojis)}', inline=False)
-                    embed.add_field(name='Created', value=f'{guild.created_at}', inline=False)
-                    for member in guild.members:
-                        if member.id == bot.user.id:
-                            embed.add_field(name='Joined', value=f'{member.joined_at}', inline=False)
-                            break
-                    # support_server = bot.get_guild(1158967835616362626) # get the support server
-                    # log_channel = support_server.get_channel(1173882245753339964) # get the setup reminders channel
-                    # await log_channel.send(embed=embed)
-                except:
-                    try:
-                        for channel in guild.text_channels:
-                            try:
-                                await channel.send(f'{guild.owner.mention} You have not setup the bot for your server ({guild.name} *({guild.id})*). Use </setup:1146779160996483114> to setup the bot for your server.')
-                                logger.info(f'Sent setup reminder to {guild.owner.name} ({guild.owner.id}) of {guild.name} ({guild.id})')
-                                
-                                # support_server = bot.get_guild(1158967835616362626) # get the support server
-                                # log_channel = support_server.get_channel(1173882245753339964) # get the setup reminders channel
-                                # embed = discord.Embed(title='Role Control | Setup Reminder', description=f'Setup Reminder for server **{guild.name}** *(`{guild.id}`)*', color=0x00ff00)
-                                # embed.add_field(name='Owner', value=f'{guild.owner.name} *({guild.owner.id})*', inline=False)
-                                # embed.add_field(name='Members', value=f'Total: {guild.member_count}\nUsers: {len([member for member in guild.members if not member.bot])}\nBots: {len([member for member in guild.members if member.bot])}', inline=False)
-                                # embed.add_field(name='Channels', value=f'{len(guild.channels)}', inline=False)
-                                # embed.add_field(name='Roles', value=f'{len(guild.roles)}', inline=False)
-                                # embed.add_field(name='Emojis', value=f'{len(guild.emojis)}', inline=False)
-                                # embed.add_field(name='Created', value=f'{guild.created_at}', inline=False)
-                                # for member in guild.members:
-                                #     if member.id == bot.user.id:
-                                #         embed.add_field(name='Joined', value=f'{member.joined_at}', inline=False)
-                                #         break
-                                # await log_channel.send(embed=embed)
-                                
-                                break
-                            except:
-                                continue
-                    except:
-                        pass
-        await asyncio.sleep(86400) # 24 hours
+        now = int(time.time())
+        unconfigured = {guild.id for guild in shard_guilds(shard_id)} - await db.get_configured_guilds()
+
+        # servers that were set up or left no longer need reminding
+        finished = reminder_times.keys() - unconfigured
+        if finished:
+            await db.remove_reminder_times(finished)
+            for guild_id in finished:
+                del reminder_times[guild_id]
+
+        updated = {}
+        for guild_id in unconfigured:
+            next_reminder_at = reminder_times.get(guild_id)
+            if next_reminder_at is None:
+                # new server, place its first reminder somewhere in the next day
+                updated[guild_id] = now + random.randint(REMINDER_TICK, REMINDER_INTERVAL)
+            elif next_reminder_at <= now:
+                guild = bot.get_guild(guild_id)
+                if guild is None:
+                    continue
+                notifier.send(guild.id, guild.owner, f'You have not setup the bot for your server ({guild.name} *({guild.id})*). Use </setup:1146779160996483114> to setup the bot for your server.', fallback=guild)
+                logger.info(f'Queued setup reminder to {guild.owner} of {guild.name} ({guild.id})')
+                updated[guild_id] = now + REMINDER_INTERVAL + random.randint(-REMINDER_JITTER, REMINDER_JITTER)
+
+                # support_server = bot.get_guild(1158967835616362626) # get the support server
+                # log_channel = support_server.get_channel(1173882245753339964) # get the setup reminders channel
+                # embed = discord.Embed(title='Role Control | Setup Reminder', description=f'Setup Reminder for server **{guild.name}** *(`{guild.id}`)*', color=0x00ff00)
+                # embed.add_field(name='Owner', value=f'{guild.owner.name} *({guild.owner.id})*', inline=False)
+                # embed.add_field(name='Channels', value=f'{len(guild.channels)}', inline=False)
+                # embed.add_field(name='Roles', value=f'{len(guild.roles)}', inline=False)
+                # embed.add_field(name='Created', value=f'{guild.created_at}', inline=False)
+                # await log_channel.send(embed=embed)
+        if updated:
+            await db.set_reminder_times(updated)
+            reminder_times.update(updated)
+        await asyncio.sleep(REMINDER_TICK)
 
 #* Check if server is blacklisted
-async def check_blacklist():
-    await bot.wait_until_ready()
+async def check_blacklist(shard_id):
+    # consistency check only, joins and the blacklist command enforce it straight away
     while not bot.is_closed():
-        with open('blacklist.json', 'r') as f:
-            blacklist = json.load(f)
-        for guild in bot.guilds:
-            if str(guild.id) in blacklist['servers']:
-                try:
-                    await guild.owner.send(f'Your server **{guild.name}** *({guild.id})* has been blacklisted from using Role Control.\nIf you believe this is a mistake, please contact the developer. *(652498200447549450)*')
-                except:
-                    try:
-                        for channel in guild.text_channels:
-                            try:
-                                await channel.send(f'{guild.owner.mention} This server has been blacklisted from using Role Control.\nIf you believe this is a mistake, please contact the developer. *(652498200447549450)*')
-                                break
-                            except:
-                                continue
-                    except:
-                        pass
-                await guild.leave()
+        for guild_id in db.blacklist & {guild.id for guild in shard_guilds(shard_id)}:
+            guild = bot.get_guild(guild_id)
+            if guild is not None:
+                await leave_blacklisted(guild)
         await asyncio.sleep(60) # 1 minute
 
+#* Temp role scheduler
+class TempRoleEntry:
+    __slots__ = ('expiry', 'guild_id', 'role_id', 'user_id')
+
+    def __init__(self, expiry, guild_id, role_id, user_id):
+        self.expiry = expiry
+        self.guild_id = guild_id
+        self.role_id = role_id
+        self.user_id = user_id
+
+    def __lt__(self, other):
+        return self.expiry < other.expiry
+
+    @property
+    def key(self):
+        return (self.guild_id, self.role_id, self.user_id)
+
+class TempRoleScheduler:
+    '''Min-heap of temp role expiries (epoch seconds) so the expiry loop can sleep exactly until the next one.
+
+    Removed or replaced entries stay in the heap and are skipped when popped, `expiries` holds the live expiry per key.
+    '''
+
+    def __init__(self):
+        self.heap = []
+        self.expiries = {}
+        self.wakeup = asyncio.Event()
+
+    def load(self, rows):
+        for guild_id, role_id, user_id, expiry in rows:
+            self.add(guild_id, role_id, user_id, expiry)
+
+    def add(self, guild_id, role_id, user_id, expiry):
+        entry = TempRoleEntry(expiry, guild_id, role_id, user_id)
+        self.expiries[entry.key] = expiry
+        heapq.heappush(self.heap, entry)
+        # wake the loop if this is now the next expiry
+        if self.heap[0] is entry:
+            self.wakeup.set()
+
+    def remove(self, guild_id, role_id, user_id):
+        self.expiries.pop((guild_id, role_id, user_id), None)
+        self.compact()
+
+    def forget_guild(self, guild_id):
+        for key in [key for key in self.expiries if key[0] == guild_id]:
+            del self.expiries[key]
+        self.compact()
+
+    def compact(self):
+        # drop stale entries once they outnumber the live ones
+        if len(self.heap) > 2 * len(self.expiries) + 64:
+            self.heap = [entry for entry in self.heap if self.expiries.get(entry.key) == entry.expiry]
+            heapq.heapify(self.heap)
+
+    def pop_due(self, now):
+        due = []
+        while self.heap and self.heap[0].expiry <= now:
+            entry = heapq.heappop(self.heap)
+            if self.expiries.get(entry.key) == entry.expiry:
+                del self.expiries[entry.key]
+                due.append(entry)
+        return due
+
+    async def wait(self):
+        # sleeps until the next expiry, restarting whenever an earlier one is added
+        while True:
+            self.wakeup.clear()
+            delay = max(0, self.heap[0].expiry - time.time()) if self.heap else None
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                return
+
+
+class ShardedTempRoleScheduler:
+    '''One TempRoleScheduler per shard, so each shard's expiry loop only wakes for its own servers.'''
+
+    def __init__(self):
+        self.shards = collections.defaultdict(TempRoleScheduler)
+
+    def __getitem__(self, shard_id):
+        return self.shards[shard_id]
+
+    def add(self, guild_id, role_id, user_id, expiry):
+        self.shards[shard_for(guild_id)].add(guild_id, role_id, user_id, expiry)
+
+    def remove(self, guild_id, role_id, user_id):
+        self.shards[shard_for(guild_id)].remove(guild_id, role_id, user_id)
+
+    def forget_guild(self, guild_id):
+        self.shards[shard_for(guild_id)].forget_guild(guild_id)
+
+
+temp_role_scheduler = ShardedTempRoleScheduler()
+
 #* Check temp roles
-async def check_temproles():
-    await bot.wait_until_ready()
-    while not bot.is_closed():
-        c.execute("SELECT * FROM temp_roles")
-        temp_roles = c.fetchall()
-        current_time = datetime.now()
-
-        for temp_role in temp_roles:
-            timestamp_str = temp_role[3]  # Get the timestamp string
-            timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S.%f')  # Parse the string to a datetime
-
-            if current_time >= timestamp:
-                guild = bot.get_guild(temp_role[0])
-                role = guild.get_role(temp_role[1])
-                user = guild.get_member(temp_role[2])
+# how many servers expire temp roles at the same time, one per worker that can run role changes
+TEMP_ROLE_CONCURRENCY = actions.capacity(ROLES)
+TEMP_ROLE_RETRY = 30 # seconds before expiring again after a failed attempt
+
+async def expire_temp_roles(rows):
+    # group expired roles by server and member, so each member needs one request
+    grouped = {}
+    for guild_id, role_id, user_id, expiry in rows:
+        grouped.setdefault(guild_id, {}).setdefault(user_id, []).append(role_id)
+
+    processed = []
+    notices = []
+    semaphore = asyncio.Semaphore(TEMP_ROLE_CONCURRENCY)
+
+    async def expire_guild(guild_id, members):
+        async with semaphore:
+            guild = bot.get_guild(guild_id)
+            for user_id, role_ids in members.items():
+                processed.extend((guild_id, role_id, user_id) for role_id in role_ids)
+                if guild is None:
+                    continue
+                user = guild.get_member(user_id)
+                roles = [role for role in map(guild.get_role, role_ids) if role is not None]
+                if user is None or not roles:
+                    continue
+                role_names = ', '.join(f'`{role.name}`' for role in roles)
+                held = [role for role in roles if role in user.roles]
                 try:
-                    await user.remove_roles(role)
-                    try:
-                        await user.send(f'Your temporary role `{role.name}` in `{guild.name}` *({guild.id})* has expired and has been removed.')
-                    except:
-                        pass
+                    if held:
+                        # per-role removals, a full role list edit could undo changes the cache has not caught up with
+                        await actions.enqueue(ROLES, guild.id, user.remove_roles, *held, reason='Temporary role expired', atomic=True)
+                    notices.append((user, f'Your temporary role(s) {role_names} in `{guild.name}` *({guild.id})* expired and have been removed.'))
                 except:
-                    logger.warning(f'User doesn\'t have role {role.name} in {guild.name} ({guild.id})?\nProceeding to remove from database.')
-                    try:
-                        await user.send(f'Your temporary role `{role.name}` in `{guild.name}` *({guild.id})* has expired and has been removed.\n> **Note:** I was unable to remove the role from you. Perhaps it was already removed? *(Contact the server\'s staff if you still have it)*')
-                    except:
-                        pass
-                c.execute("DELETE FROM temp_roles WHERE server_id=? AND role_id=? AND user_id=?", (guild.id, role.id, user.id))
-                conn.commit()
-        await asyncio.sleep(60) # 1 minute
-
-#* Find bot role
-async def find_botrole():
-    await bot.wait_until_ready()
+                    logger.warning(f'Failed to remove temp role(s) {role_names} from {user_id} in {guild.name} ({guild.id})\nProceeding to remove from database.')
+                    notices.append((user, f'Your temporary role(s) {role_names} in `{guild.name}` *({guild.id})* expired and have been removed.\n> **Note:** I was unable to remove the role from you. Perhaps it was already removed? *(Contact the server\'s staff if you still have it)*'))
+
+    await asyncio.gather(*[expire_guild(guild_id, members) for guild_id, members in grouped.items()])
+    await db.remove_temp_roles(processed)
+    # DMs go out after roles are removed and rows deleted
+    for user, message in notices:
+        notifier.send(user.guild.id, user, message)
+
+async def check_temproles(shard_id):
+    scheduler = temp_role_scheduler[shard_id]
+    scheduler.load(await db.get_temp_roles(shard_id, bot.shard_count))
     while not bot.is_closed():
-        for guild in bot.guilds:
-            managed_roles = [role for role in guild.me.roles if role.managed]
-
-            if managed_roles:
-                for role in managed_roles:
-                    c.execute('SELECT role_id FROM bot_role WHERE server_id=?', (guild.id,))
-                    if not c.fetchone():
-                        c.execute('INSERT INTO bot_role VALUES (?, ?)', (guild.id, role.id))
-                        conn.commit()
-            else:
-                logger.error(f'Failed to find managed role in {guild.name} ({guild.id})')
+        await scheduler.wait()
+        now = time.time()
+        scheduler.pop_due(now)
 
-        await asyncio.sleep(86400) # 24 hours
+        # the database decides what is due, the heap only decides when to look
+        rows = await db.get_due_temp_roles(now, shard_id, bot.shard_count)
+        if rows:
+            try:
+                await expire_temp_roles(rows)
+            except Exception as e:
+                logger.error(f'Failed to expire temp roles on shard {shard_id}, retrying in {TEMP_ROLE_RETRY} seconds: {e}')
+                # the rows are still in the database, put them back in the heap so the loop wakes for them again,
+                # unless the temp role was given again meanwhile and already has its own expiry
+                for guild_id, role_id, user_id, expiry in rows:
+                    if (guild_id, role_id, user_id) not in scheduler.expiries:
+                        scheduler.add(guild_id, role_id, user_id, now + TEMP_ROLE_RETRY)
+
+#* Per-shard loops
+# every shard runs its own copy of each job over only its servers, so a slow shard cannot delay the others
+SHARD_LOOPS = (setup_reminder, check_blacklist, check_temproles)
+shard_loops = {}
+
+def start_shard_loops(shard_id):
+    if shard_id in shard_loops:
+        return
+    shard_loops[shard_id] = [run_in_background(loop(shard_id)) for loop in SHARD_LOOPS]
+    logger.info(f'Started background loops for shard {shard_id}')
 
 
 ## ? Bot startup
 if __name__ == '__main__':
-    bot.loop.create_task(setup_reminder())
-    bot.loop.create_task(check_blacklist())
-    bot.loop.create_task(check_temproles())
-    bot.loop.create_task(find_botrole())
     bot.run(os.getenv('TOKEN'))
\ No newline at end of file